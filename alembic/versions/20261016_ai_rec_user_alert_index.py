@@ -0,0 +1,37 @@
+"""Composite index for per-alert copilot recommendation lookups.
+
+Revision ID: 20261016_ai_rec_user_alert
+Revises: 20261016_snapshot_price_cover
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261016_ai_rec_user_alert"
+down_revision = "20261016_snapshot_price_cover"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_ai_recommendations_user_alert_created_desc",
+            "ai_recommendations",
+            ["user_id", "alert_id", sa.text("created_at DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_ai_recommendations_user_alert_created_desc",
+            table_name="ai_recommendations",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
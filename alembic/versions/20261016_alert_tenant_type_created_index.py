@@ -0,0 +1,52 @@
+"""Composite index for digest alert window queries.
+
+Replaces the (tenant_id, alert_type) prefix index it makes redundant.
+
+Revision ID: 20261016_alert_type_created
+Revises: 20261016_ai_rec_user_alert
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261016_alert_type_created"
+down_revision = "20261016_ai_rec_user_alert"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_alerts_tenant_type_created_desc",
+            "alerts",
+            ["tenant_id", "alert_type", sa.text("created_at DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_alerts_tenant_type",
+            table_name="alerts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_alerts_tenant_type",
+            "alerts",
+            ["tenant_id", "alert_type"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_alerts_tenant_type_created_desc",
+            table_name="alerts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
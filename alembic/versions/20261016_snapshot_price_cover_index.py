@@ -0,0 +1,39 @@
+"""Covering index for snapshot price windows.
+
+Revision ID: 20261016_snapshot_price_cover
+Revises: 20260105_baseline
+Create Date: 2026-10-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261016_snapshot_price_cover"
+down_revision = "20260105_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_market_snapshots_market_bucket_cover",
+            "market_snapshots",
+            ["market_id", "snapshot_bucket"],
+            postgresql_include=["market_p_yes"],
+            postgresql_where=sa.text("market_p_yes IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_market_snapshots_market_bucket_cover",
+            table_name="market_snapshots",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -3,6 +3,7 @@ from __future__ import annotations
 import hashlib
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Literal
 
 _STOPWORDS = {
@@ -78,6 +79,18 @@ _ASSET_DISPLAY = {
     "litecoin": "LTC",
 }
 
+_PUNCTUATION_TRANSLATION = str.maketrans(
+    {
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u201c": '"',
+        "\u201d": '"',
+        "\u2013": "-",
+        "\u2014": "-",
+    }
+)
+_NON_ALNUM_RUN_RE = re.compile(r"[^a-z0-9]+")
+
 
 @dataclass(frozen=True)
 class ThemeExtract:
@@ -95,23 +108,10 @@ class ThemeExtract:
     team_b: str | None = None
 
 
+@lru_cache(maxsize=4096)
 def normalize_text(text: str) -> str:
-    text = text.lower()
-    text = text.translate(
-        str.maketrans(
-            {
-                "\u2018": "'",
-                "\u2019": "'",
-                "\u201c": '"',
-                "\u201d": '"',
-                "\u2013": "-",
-                "\u2014": "-",
-            }
-        )
-    )
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    text = text.lower().translate(_PUNCTUATION_TRANSLATION)
+    return _NON_ALNUM_RUN_RE.sub(" ", text).strip()
 
 
 def strip_stopwords(tokens: list[str]) -> list[str]:
@@ -164,6 +164,7 @@ def format_range(low: int, high: int) -> str:
     return f"{low_label}-{high_label}"
 
 
+@lru_cache(maxsize=4096)
 def extract_theme(title: str, *, category: str | None = None, slug: str | None = None) -> ThemeExtract:
     title = title or ""
     normalized = normalize_text(title)
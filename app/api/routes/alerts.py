@@ -9,7 +9,7 @@ from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
 from ...core.ai_copilot import COPILOT_RUN_KEY
-from ...core.alert_classification import classify_alert_with_snapshots
+from ...core.alert_classification import classify_alerts_with_snapshots
 from ...core.alerts import _alert_direction, _format_probability_label, _reversal_flag, _sustained_snapshot_count
 from ...core.market_links import attach_market_slugs, market_url
 from ...cache import build_cache_key, cached_json_response
@@ -161,8 +161,8 @@ def alerts_latest(
         attach_market_slugs(db, alerts)
 
         results = []
-        for alert in alerts:
-            classification = classify_alert_with_snapshots(db, alert)
+        classifications = classify_alerts_with_snapshots(db, alerts)
+        for alert, classification in zip(alerts, classifications):
             points = points_by_market.get(str(alert.market_id), [])
             direction = _alert_direction(alert)
             sustained = _sustained_snapshot_count(points, direction)
@@ -429,8 +429,8 @@ def copilot_recommendations(
         attach_market_slugs(db, alerts)
 
         results = []
-        for alert in alerts:
-            classification = classify_alert_with_snapshots(db, alert)
+        classifications = classify_alerts_with_snapshots(db, alerts)
+        for alert, classification in zip(alerts, classifications):
             points = points_by_market.get(str(alert.market_id), [])
             direction = _alert_direction(alert)
             sustained = _sustained_snapshot_count(points, direction)
@@ -1,15 +1,21 @@
+import heapq
 import html
 import json
 import logging
 import re
 import time
 import uuid
+from collections import Counter
 from contextlib import nullcontext
 from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Sequence
 
 import redis
+from rq import Queue
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from ..alerts.theme_key import extract_theme
@@ -19,15 +25,15 @@ from ..models import (
     AiRecommendationEvent,
     AiThemeMute,
     Alert,
-    MarketSnapshot,
     PendingTelegramChat,
     User,
 )
 from ..settings import settings
 from . import defaults
+from .effective_settings import EffectiveSettings
 from .user_settings import get_effective_user_settings
 from ..llm.client import get_trade_recommendation
-from .alert_classification import classify_alert_with_snapshots
+from .alert_classification import classify_alert_with_snapshots, load_price_points
 from .market_links import attach_market_slugs, market_url
 from .signal_speed import SIGNAL_SPEED_FAST, SIGNAL_SPEED_STANDARD
 from .telegram import send_telegram_message, answer_callback_query, edit_message_reply_markup
@@ -35,12 +41,66 @@ from ..services.entitlements_service import get_active_subscription
 
 logger = logging.getLogger(__name__)
 redis_conn = redis.from_url(settings.REDIS_URL)
+queue = Queue("default", connection=redis_conn)
+_CLAIM_THEME_SCRIPT = redis_conn.register_script(
+    """
+    if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+        return {1, tonumber(ARGV[1])}
+    end
+    local ttl = redis.call('TTL', KEYS[1])
+    if ttl < 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+    end
+    return {0, ttl}
+    """
+)
+_COMPLETE_RUN_SCRIPT = redis_conn.register_script(
+    """
+    for i = 1, #ARGV, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    local completed = redis.call('HINCRBY', KEYS[1], 'jobs_completed', 1)
+    local expected = tonumber(redis.call('HGET', KEYS[1], 'expected_jobs'))
+    if not expected or completed < expected then
+        return false
+    end
+    if redis.call('HINCRBY', KEYS[1], 'logged', 1) ~= 1 then
+        return false
+    end
+    return redis.call('HGETALL', KEYS[1])
+    """
+)
 
 REC_STATUS_PROPOSED = "PROPOSED"
 REC_STATUS_CONFIRMED = "CONFIRMED"
 REC_STATUS_SKIPPED = "SKIPPED"
 REC_STATUS_EXPIRED = "EXPIRED"
 COPILOT_FOOTER = "<i>Manual execution only. PMD does not place orders.</i>"
+RR_SKEW_LOW_NOTE = "Risk/reward skewed at low prices: limited upside vs a larger mean-reversion swing."
+RR_SKEW_HIGH_NOTE = "Risk/reward skewed at high prices: limited upside vs a larger downside on pullback."
+_P_MIN = defaults.DEFAULT_P_MIN
+_P_MAX = defaults.DEFAULT_P_MAX
+_P_MIN_SKEW_SUFFIX = f"below {_P_MIN * 100:.0f}%."
+_P_MAX_SKEW_SUFFIX = f"above {_P_MAX * 100:.0f}%."
+AI_MESSAGE_TEMPLATE = (
+    "{header}{signal_line}\n"
+    "{title}\n"
+    "Move: {move} | {p_yes}\n"
+    "{liq}\n"
+    "\n"
+    "<b>Evidence</b>\n"
+    "{evidence}\n"
+    "\n"
+    "{rationale_header}\n"
+    "{rationale}\n"
+    "\n"
+    "{risks_header}\n"
+    "{risks}{what_changes}\n"
+    "\n"
+    "{link}\n"
+    "\n"
+    "{footer}"
+)
 CALLBACK_SEEN_KEY = "ai:telegram:callback:{callback_id}"
 CALLBACK_TTL_SECONDS = 60 * 60 * 24
 COPILOT_THEME_DEDUPE_KEY = "copilot:theme:{user_id}:{theme_key}"
@@ -52,7 +112,13 @@ COPILOT_RUN_KEY = "copilot:run:{run_id}"
 COPILOT_LAST_STATUS_KEY = "copilot:last_status:{user_id}"
 COPILOT_LAST_STATUS_TTL_SECONDS = 60 * 60 * 24
 COPILOT_RUN_TTL_SECONDS = 60 * 60 * 24
+MARKET_LINK_CACHE_SIZE = 8192
+COMPACT_JSON_SEPARATORS = (",", ":")
 START_PAYLOAD_PREFIX = "pmd_"
+CONFIRM_CALLBACK = "confirm:{rec_id}"
+SKIP_CALLBACK = "skip:{rec_id}"
+MUTE_THEME_CALLBACK = "mute:theme_alert:{alert_id}:1440"
+MUTE_MARKET_CALLBACK = "mute:market_alert:{alert_id}:1440"
 START_FOOTER = ""
 START_MESSAGE_SUCCESS = "✅ Account linked. You will now receive PMD alerts here."
 START_MESSAGE_IDEMPOTENT = "✅ This chat is already linked."
@@ -65,9 +131,17 @@ START_MESSAGE_PENDING = (
     "then open the Telegram link."
 )
 START_MESSAGE_INVALID = "❌ Invalid link. Generate a new link from your PMD dashboard."
+_THRESHOLD_RE = re.compile(
+    r"(?:\b0?\.?15\b|\b15%\b|\b15\s*percent\b|\b0?\.?85\b|\b85%\b|\b85\s*percent\b)",
+    re.IGNORECASE,
+)
+_SUSTAINED_RE = re.compile(r"(?:Sustained move across|Observed across) (\d+) snapshots .*?\(~?(\d+)m\)")
+_ABS_MOVE_RE = re.compile(r"Abs move: [+-]?([0-9.]+)")
+_WINDOW_ABS_RE = re.compile(r"Abs move: .*?\((\d+)m\)")
+_NON_ALNUM_RE = re.compile(r"\W")
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CopilotThemeClaim:
     claimed: bool
     key: str
@@ -75,6 +149,22 @@ class CopilotThemeClaim:
     ttl_remaining: int | None
 
 
+@dataclass(frozen=True, slots=True)
+class EvidenceMetrics:
+    sustained_snapshots: int | None
+    sustained_minutes: int | None
+    abs_move: float | None
+    window_minutes: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class AlertView:
+    delta: float
+    direction: int
+    p_yes: float | None
+    p_label: str
+
+
 def create_ai_recommendation(
     db: Session,
     user: User,
@@ -82,10 +172,13 @@ def create_ai_recommendation(
     run_id: str | None = None,
     signal_speed: str | None = None,
     window_minutes: int | None = None,
+    effective: EffectiveSettings | None = None,
+    run_counters: Counter | None = None,
 ) -> AiRecommendation | None:
     now_ts = datetime.now(timezone.utc)
     theme_key = _theme_key_for_alert(alert)
-    effective = get_effective_user_settings(user, db=db)
+    if effective is None:
+        effective = get_effective_user_settings(user, db=db)
     signal_speed = signal_speed or SIGNAL_SPEED_STANDARD
     full_ttl_minutes = max(int(effective.copilot_theme_ttl_minutes), 1)
     full_ttl_seconds = max(full_ttl_minutes * 60, 60)
@@ -140,8 +233,9 @@ def create_ai_recommendation(
     try:
         classification = classify_alert_with_snapshots(db, alert)
         evidence = _build_evidence(db, alert)
+        metrics = _parse_evidence_metrics(evidence)
         if window_minutes is None:
-            window_minutes = _parse_window_minutes_from_evidence(evidence)
+            window_minutes = metrics.window_minutes
         llm_context = _build_llm_context(
             alert,
             classification,
@@ -151,11 +245,11 @@ def create_ai_recommendation(
             signal_speed=signal_speed,
             window_minutes=window_minutes,
         )
-        _increment_copilot_run_counter(run_id, "llm_calls_attempted", 1)
+        _increment_copilot_run_counter(run_id, "llm_calls_attempted", 1, run_counters)
         try:
             llm_result = get_trade_recommendation(llm_context)
         except Exception:
-            _increment_copilot_run_counter(run_id, "llm_calls_failed", 1)
+            _increment_copilot_run_counter(run_id, "llm_calls_failed", 1, run_counters)
             logger.exception("copilot_llm_failed user_id=%s alert_id=%s", user.user_id, alert.id)
             _release_copilot_theme(claim.key, failure_ttl_seconds)
             return None
@@ -164,12 +258,14 @@ def create_ai_recommendation(
             alert,
             evidence,
             signal_speed=signal_speed,
+            metrics=metrics,
         )
-        _increment_copilot_run_counter(run_id, "llm_calls_succeeded", 1)
+        _increment_copilot_run_counter(run_id, "llm_calls_succeeded", 1, run_counters)
 
         recommendation = AiRecommendation(
             user_id=user.user_id,
             alert_id=alert.id,
+            created_at=now_ts,
             recommendation=llm_result["recommendation"],
             confidence=llm_result["confidence"],
             rationale=llm_result["rationale"],
@@ -178,23 +274,22 @@ def create_ai_recommendation(
             expires_at=now_ts + timedelta(minutes=defaults.AI_RECOMMENDATION_EXPIRES_MINUTES),
         )
         db.add(recommendation)
-        db.commit()
-        db.refresh(recommendation)
-
+        db.flush()
         record_ai_event(db, recommendation, "proposed", "ai_copilot_recommendation_created")
+        db.commit()
         logger.debug(
             "ai_rec_created user_id=%s alert_id=%s recommendation=%s confidence=%s",
             user.user_id,
             alert.id,
-            recommendation.recommendation,
-            recommendation.confidence,
+            llm_result["recommendation"],
+            llm_result["confidence"],
         )
-        if recommendation.recommendation in {"WAIT", "SKIP"}:
+        if llm_result["recommendation"] in {"WAIT", "SKIP"}:
             logger.debug(
                 "ai_rec_hold_reason user_id=%s alert_id=%s rationale=%s",
                 user.user_id,
                 alert.id,
-                recommendation.rationale[:200],
+                llm_result["rationale"][:200],
             )
         sent = _send_recommendation_message(
             db,
@@ -205,6 +300,9 @@ def create_ai_recommendation(
             run_id=run_id,
             signal_speed=signal_speed,
             window_minutes=window_minutes,
+            metrics=metrics,
+            now_ts=now_ts,
+            run_counters=run_counters,
         )
         if sent:
             _extend_copilot_theme_ttl(claim.key, full_ttl_seconds)
@@ -359,26 +457,19 @@ def _send_start_reply(chat_id: int, message: str) -> None:
 
 def _upsert_pending_chat(db: Session, chat_id: int) -> None:
     now_ts = datetime.now(timezone.utc)
+    stmt = pg_insert(PendingTelegramChat).values(
+        telegram_chat_id=chat_id,
+        first_seen_at=now_ts,
+        last_seen_at=now_ts,
+        status="pending",
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["telegram_chat_id"],
+        set_={"last_seen_at": stmt.excluded.last_seen_at},
+    )
     with _transaction(db):
-        existing = (
-            db.query(PendingTelegramChat)
-            .filter(PendingTelegramChat.telegram_chat_id == chat_id)
-            .one_or_none()
-        )
-        if existing:
-            existing.last_seen_at = now_ts
-            _log_event("pending_exists")
-            return
-
-        db.add(
-            PendingTelegramChat(
-                telegram_chat_id=chat_id,
-                first_seen_at=now_ts,
-                last_seen_at=now_ts,
-                status="pending",
-            )
-        )
-        _log_event("pending_created")
+        db.execute(stmt)
+        _log_event("pending_upserted")
 
 
 def _normalize_chat_id(value: Any) -> int | None:
@@ -404,7 +495,7 @@ def _handle_confirm_skip(
     action: str,
     chat_id: int | str | None,
 ) -> dict[str, Any]:
-    rec = db.query(AiRecommendation).filter(AiRecommendation.id == rec_id).one_or_none()
+    rec = db.get(AiRecommendation, rec_id)
     if not rec:
         return {"ok": False, "reason": "recommendation_not_found"}
 
@@ -429,16 +520,16 @@ def _handle_confirm_skip(
         if rec.recommendation in {"WAIT", "SKIP"}:
             return {"ok": False, "reason": "not_actionable", "message": "Recommendation is not actionable."}
         rec.status = REC_STATUS_CONFIRMED
-        db.commit()
         record_ai_event(db, rec, "confirmed", "telegram_confirm")
+        db.commit()
         logger.debug("ai_rec_confirmed rec_id=%s user_id=%s", rec.id, rec.user_id)
         if chat_id:
             _send_confirm_payload(db, str(chat_id), rec)
         return {"ok": True, "message": "Confirmed."}
 
     rec.status = REC_STATUS_SKIPPED
-    db.commit()
     record_ai_event(db, rec, "skipped", "telegram_skip")
+    db.commit()
     logger.debug("ai_rec_skipped rec_id=%s user_id=%s", rec.id, rec.user_id)
     if chat_id:
         send_telegram_message(str(chat_id), "Skipped.")
@@ -467,7 +558,7 @@ def _handle_mute(
             alert_id = int(target_key)
         except (TypeError, ValueError):
             return {"ok": False, "reason": "invalid_alert_id"}
-        alert = db.query(Alert).filter(Alert.id == alert_id).one_or_none()
+        alert = db.get(Alert, alert_id)
         if not alert:
             return {"ok": False, "reason": "alert_not_found"}
         if target_type == "theme_alert":
@@ -478,34 +569,21 @@ def _handle_mute(
             target_type = "market"
 
     if target_type == "theme":
-        mute = (
-            db.query(AiThemeMute)
-            .filter(AiThemeMute.user_id == user.user_id, AiThemeMute.theme_key == target_key)
-            .one_or_none()
-        )
-        if mute:
-            if mute.expires_at >= expires_at:
-                return {"ok": True, "message": "Already muted."}
-            mute.expires_at = expires_at
-        else:
-            mute = AiThemeMute(user_id=user.user_id, theme_key=target_key, expires_at=expires_at)
-            db.add(mute)
-        muted_label = "theme"
+        model, key_column, muted_label = AiThemeMute, "theme_key", "theme"
     else:
-        mute = (
-            db.query(AiMarketMute)
-            .filter(AiMarketMute.user_id == user.user_id, AiMarketMute.market_id == target_key)
-            .one_or_none()
-        )
-        if mute:
-            if mute.expires_at >= expires_at:
-                return {"ok": True, "message": "Already muted."}
-            mute.expires_at = expires_at
-        else:
-            mute = AiMarketMute(user_id=user.user_id, market_id=target_key, expires_at=expires_at)
-            db.add(mute)
-        muted_label = "market"
+        model, key_column, muted_label = AiMarketMute, "market_id", "market"
+    stmt = pg_insert(model).values(
+        {"user_id": user.user_id, key_column: target_key, "expires_at": expires_at}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", key_column],
+        set_={"expires_at": stmt.excluded.expires_at},
+        where=model.expires_at < stmt.excluded.expires_at,
+    ).returning(model.id)
+    updated = db.execute(stmt).first()
     db.commit()
+    if updated is None:
+        return {"ok": True, "message": "Already muted."}
     if chat_id:
         send_telegram_message(str(chat_id), f"Muted this {muted_label} for 24h.")
     return {"ok": True, "message": f"Muted this {muted_label} for 24h."}
@@ -531,32 +609,40 @@ def _copilot_daily_count_key(
 
 
 def _copilot_hourly_count_key(user_id: Any, now_ts: datetime) -> str:
-    hour_key = now_ts.strftime("%Y-%m-%d-%H")
+    hour_key = f"{now_ts.year:04d}-{now_ts.month:02d}-{now_ts.day:02d}-{now_ts.hour:02d}"
     return COPILOT_HOURLY_COUNT_KEY.format(user_id=user_id, hour=hour_key)
 
 
-def _increment_copilot_daily_count(user_id: Any, signal_speed: str = SIGNAL_SPEED_STANDARD) -> None:
+def _increment_copilot_daily_count(
+    user_id: Any,
+    signal_speed: str = SIGNAL_SPEED_STANDARD,
+    now_ts: datetime | None = None,
+) -> None:
     if not user_id:
         return
-    now_ts = datetime.now(timezone.utc)
+    now_ts = now_ts or datetime.now(timezone.utc)
     key = _copilot_daily_count_key(user_id, now_ts, signal_speed)
     ttl_seconds = max(int(defaults.COPILOT_DAILY_TTL_SECONDS), 60)
     try:
-        redis_conn.incr(key)
-        redis_conn.expire(key, ttl_seconds)
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.incr(key)
+        pipe.expire(key, ttl_seconds)
+        pipe.execute()
     except Exception:
         logger.exception("copilot_daily_count_increment_failed user_id=%s", user_id)
 
 
-def _increment_copilot_hourly_count(user_id: Any) -> None:
+def _increment_copilot_hourly_count(user_id: Any, now_ts: datetime | None = None) -> None:
     if not user_id:
         return
-    now_ts = datetime.now(timezone.utc)
+    now_ts = now_ts or datetime.now(timezone.utc)
     key = _copilot_hourly_count_key(user_id, now_ts)
     ttl_seconds = max(int(defaults.COPILOT_HOURLY_TTL_SECONDS), 60)
     try:
-        redis_conn.incr(key)
-        redis_conn.expire(key, ttl_seconds)
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.incr(key)
+        pipe.expire(key, ttl_seconds)
+        pipe.execute()
     except Exception:
         logger.exception("copilot_hourly_count_increment_failed user_id=%s", user_id)
 
@@ -572,16 +658,18 @@ def init_copilot_run(
     key = COPILOT_RUN_KEY.format(run_id=run_id)
     started_at = run_started_at if run_started_at is not None else time.time()
     try:
-        redis_conn.hsetnx(key, "base_summary", json.dumps(summary, ensure_ascii=True))
-        redis_conn.hsetnx(key, "expected_jobs", int(expected_jobs))
-        redis_conn.hsetnx(key, "jobs_completed", 0)
-        redis_conn.hsetnx(key, "llm_calls_attempted", 0)
-        redis_conn.hsetnx(key, "llm_calls_succeeded", 0)
-        redis_conn.hsetnx(key, "telegram_sends_attempted", 0)
-        redis_conn.hsetnx(key, "telegram_sends_succeeded", 0)
-        redis_conn.hsetnx(key, "started_at", float(started_at))
-        redis_conn.hsetnx(key, "logged", 0)
-        redis_conn.expire(key, COPILOT_RUN_TTL_SECONDS)
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.hsetnx(key, "base_summary", json.dumps(summary, separators=COMPACT_JSON_SEPARATORS))
+        pipe.hsetnx(key, "expected_jobs", int(expected_jobs))
+        pipe.hsetnx(key, "jobs_completed", 0)
+        pipe.hsetnx(key, "llm_calls_attempted", 0)
+        pipe.hsetnx(key, "llm_calls_succeeded", 0)
+        pipe.hsetnx(key, "telegram_sends_attempted", 0)
+        pipe.hsetnx(key, "telegram_sends_succeeded", 0)
+        pipe.hsetnx(key, "started_at", float(started_at))
+        pipe.hsetnx(key, "logged", 0)
+        pipe.expire(key, COPILOT_RUN_TTL_SECONDS)
+        pipe.execute()
         _maybe_log_copilot_run(run_id)
     except Exception:
         logger.exception("copilot_run_init_failed run_id=%s", run_id)
@@ -601,11 +689,12 @@ def store_copilot_last_status(summary: dict[str, object]) -> None:
     reason_counts = summary.get("skipped_by_reason_counts") or {}
     top_reasons = []
     if isinstance(reason_counts, dict):
-        ranked = sorted(
-            ((key, reason_counts.get(key, 0)) for key in reason_counts),
+        ranked = heapq.nsmallest(
+            3,
+            reason_counts.items(),
             key=lambda item: (-int(item[1] or 0), str(item[0])),
         )
-        top_reasons = [reason for reason, _count in ranked[:3]]
+        top_reasons = [reason for reason, _count in ranked]
     payload = {
         "user_id": user_id,
         "run_id": summary.get("run_id"),
@@ -616,16 +705,24 @@ def store_copilot_last_status(summary: dict[str, object]) -> None:
     try:
         redis_conn.set(
             COPILOT_LAST_STATUS_KEY.format(user_id=user_id),
-            json.dumps(payload, ensure_ascii=True),
+            json.dumps(payload, separators=COMPACT_JSON_SEPARATORS),
             ex=COPILOT_LAST_STATUS_TTL_SECONDS,
         )
     except Exception:
         logger.exception("copilot_last_status_store_failed user_id=%s", user_id)
 
 
-def _increment_copilot_run_counter(run_id: str | None, field: str, amount: int) -> None:
+def _increment_copilot_run_counter(
+    run_id: str | None,
+    field: str,
+    amount: int,
+    run_counters: Counter | None = None,
+) -> None:
     if not run_id:
         return
+    if run_counters is not None:
+        run_counters[field] += amount
+        return
     key = COPILOT_RUN_KEY.format(run_id=run_id)
     try:
         redis_conn.hincrby(key, field, amount)
@@ -633,98 +730,101 @@ def _increment_copilot_run_counter(run_id: str | None, field: str, amount: int)
         logger.exception("copilot_run_counter_failed run_id=%s field=%s", run_id, field)
 
 
-def _complete_copilot_run(run_id: str | None) -> None:
+def _complete_copilot_run(run_id: str | None, run_counters: Counter | None = None) -> None:
     if not run_id:
         return
     key = COPILOT_RUN_KEY.format(run_id=run_id)
+    args: list[Any] = []
+    for field, amount in (run_counters or {}).items():
+        if amount:
+            args.extend((field, amount))
     try:
-        redis_conn.hincrby(key, "jobs_completed", 1)
-        _maybe_log_copilot_run(run_id)
+        fields = _COMPLETE_RUN_SCRIPT(keys=[key], args=args, client=redis_conn)
+        if fields:
+            values = [_decode_redis_value(value) for value in fields]
+            _log_copilot_run(dict(zip(values[::2], values[1::2])))
     except Exception:
         logger.exception("copilot_run_complete_failed run_id=%s", run_id)
 
 
+def _decode_redis_value(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    return value
+
+
+def _redis_int(value: Any) -> int:
+    if value is None:
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
 def _maybe_log_copilot_run(run_id: str | None) -> None:
     if not run_id:
         return
     key = COPILOT_RUN_KEY.format(run_id=run_id)
     try:
-        expected_raw = redis_conn.hget(key, "expected_jobs")
-        if isinstance(expected_raw, (bytes, bytearray)):
-            expected_raw = expected_raw.decode()
-        expected = int(expected_raw) if expected_raw is not None else 0
-        completed_raw = redis_conn.hget(key, "jobs_completed")
-        if isinstance(completed_raw, (bytes, bytearray)):
-            completed_raw = completed_raw.decode()
-        completed = int(completed_raw) if completed_raw is not None else 0
-        if completed < expected:
+        data = {_decode_redis_value(field): _decode_redis_value(value) for field, value in redis_conn.hgetall(key).items()}
+        if not data:
             return
-        logged_raw = redis_conn.hget(key, "logged")
-        if str(logged_raw) in {"1", "b'1'"}:
+        if _redis_int(data.get("jobs_completed")) < _redis_int(data.get("expected_jobs")):
             return
-        if not redis_conn.hsetnx(key, "logged", 1):
+        if _redis_int(data.get("logged")) > 0:
             return
-        base_raw = redis_conn.hget(key, "base_summary")
-        if not base_raw:
+        if redis_conn.hincrby(key, "logged", 1) != 1:
             return
-        if isinstance(base_raw, (bytes, bytearray)):
-            base_raw = base_raw.decode()
-        summary = json.loads(base_raw)
-
-        def _get_int(field_name: str) -> int:
-            raw = redis_conn.hget(key, field_name)
-            if raw is None:
-                return 0
-            if isinstance(raw, (bytes, bytearray)):
-                raw = raw.decode()
-            try:
-                return int(raw)
-            except ValueError:
-                return 0
-
-        started_raw = redis_conn.hget(key, "started_at")
-        if isinstance(started_raw, (bytes, bytearray)):
-            started_raw = started_raw.decode()
-        try:
-            started_at = float(started_raw) if started_raw is not None else time.time()
-        except ValueError:
-            started_at = time.time()
-        summary.update(
-            {
-                "llm_calls_attempted": _get_int("llm_calls_attempted"),
-                "llm_calls_succeeded": _get_int("llm_calls_succeeded"),
-                "telegram_sends_attempted": _get_int("telegram_sends_attempted"),
-                "telegram_sends_succeeded": _get_int("telegram_sends_succeeded"),
-                "sent": _get_int("telegram_sends_succeeded"),
-                "window": summary.get("digest_window_minutes"),
-                "selected": summary.get("themes_selected"),
-                "duration_ms": int((time.time() - started_at) * 1000),
-            }
-        )
-        reason_counts = summary.get("skipped_by_reason_counts") or {}
-        if not isinstance(reason_counts, dict):
-            reason_counts = {}
-        llm_failures = max(
-            int(summary.get("llm_calls_attempted") or 0) - int(summary.get("llm_calls_succeeded") or 0),
-            0,
-        )
-        if llm_failures:
-            reason_counts["LLM_ERROR"] = reason_counts.get("LLM_ERROR", 0) + llm_failures
-        telegram_failures = max(
-            int(summary.get("telegram_sends_attempted") or 0)
-            - int(summary.get("telegram_sends_succeeded") or 0),
-            0,
-        )
-        if telegram_failures:
-            reason_counts["TELEGRAM_ERROR"] = reason_counts.get("TELEGRAM_ERROR", 0) + telegram_failures
-        summary["skipped_by_reason_counts"] = reason_counts
-        log_copilot_run_summary(summary)
-        if summary.get("telegram_sends_succeeded") == 0:
-            store_copilot_last_status(summary)
+        _log_copilot_run(data)
     except Exception:
         logger.exception("copilot_run_maybe_log_failed run_id=%s", run_id)
 
 
+def _log_copilot_run(data: dict[str, Any]) -> None:
+    base_raw = data.get("base_summary")
+    if not base_raw:
+        return
+    summary = json.loads(base_raw)
+
+    try:
+        started_at = float(data["started_at"]) if data.get("started_at") is not None else time.time()
+    except ValueError:
+        started_at = time.time()
+    summary.update(
+        {
+            "llm_calls_attempted": _redis_int(data.get("llm_calls_attempted")),
+            "llm_calls_succeeded": _redis_int(data.get("llm_calls_succeeded")),
+            "telegram_sends_attempted": _redis_int(data.get("telegram_sends_attempted")),
+            "telegram_sends_succeeded": _redis_int(data.get("telegram_sends_succeeded")),
+            "sent": _redis_int(data.get("telegram_sends_succeeded")),
+            "window": summary.get("digest_window_minutes"),
+            "selected": summary.get("themes_selected"),
+            "duration_ms": int((time.time() - started_at) * 1000),
+        }
+    )
+    reason_counts = summary.get("skipped_by_reason_counts") or {}
+    if not isinstance(reason_counts, dict):
+        reason_counts = {}
+    llm_failures = max(
+        int(summary.get("llm_calls_attempted") or 0) - int(summary.get("llm_calls_succeeded") or 0),
+        0,
+    )
+    if llm_failures:
+        reason_counts["LLM_ERROR"] = reason_counts.get("LLM_ERROR", 0) + llm_failures
+    telegram_failures = max(
+        int(summary.get("telegram_sends_attempted") or 0)
+        - int(summary.get("telegram_sends_succeeded") or 0),
+        0,
+    )
+    if telegram_failures:
+        reason_counts["TELEGRAM_ERROR"] = reason_counts.get("TELEGRAM_ERROR", 0) + telegram_failures
+    summary["skipped_by_reason_counts"] = reason_counts
+    log_copilot_run_summary(summary)
+    if summary.get("telegram_sends_succeeded") == 0:
+        store_copilot_last_status(summary)
+
+
 def _send_recommendation_message(
     db: Session,
     user: User,
@@ -734,6 +834,9 @@ def _send_recommendation_message(
     run_id: str | None = None,
     signal_speed: str = SIGNAL_SPEED_STANDARD,
     window_minutes: int | None = None,
+    metrics: EvidenceMetrics | None = None,
+    now_ts: datetime | None = None,
+    run_counters: Counter | None = None,
 ) -> bool:
     if not user.telegram_chat_id:
         return False
@@ -757,16 +860,18 @@ def _send_recommendation_message(
         evidence,
         signal_speed=signal_speed,
         window_minutes=window_minutes,
+        metrics=metrics,
     )
-    _increment_copilot_run_counter(run_id, "telegram_sends_attempted", 1)
+    _increment_copilot_run_counter(run_id, "telegram_sends_attempted", 1, run_counters)
     response = send_telegram_message(user.telegram_chat_id, text, reply_markup=markup)
     success = bool(response and response.get("ok"))
     message_id = None
     if success:
         message_id = response.get("result", {}).get("message_id")
-        _increment_copilot_daily_count(rec.user_id, signal_speed=signal_speed)
-        _increment_copilot_hourly_count(rec.user_id)
-        _increment_copilot_run_counter(run_id, "telegram_sends_succeeded", 1)
+        sent_at = now_ts or datetime.now(timezone.utc)
+        _increment_copilot_daily_count(rec.user_id, signal_speed=signal_speed, now_ts=sent_at)
+        _increment_copilot_hourly_count(rec.user_id, now_ts=sent_at)
+        _increment_copilot_run_counter(run_id, "telegram_sends_succeeded", 1, run_counters)
         logger.debug(
             "copilot_decision_sent user_id=%s alert_id=%s rec_id=%s recommendation=%s confidence=%s signal_speed=%s",
             user.user_id,
@@ -780,7 +885,7 @@ def _send_recommendation_message(
             rec.telegram_message_id = str(message_id)
             db.commit()
     else:
-        _increment_copilot_run_counter(run_id, "telegram_sends_failed", 1)
+        _increment_copilot_run_counter(run_id, "telegram_sends_failed", 1, run_counters)
         logger.warning(
             "copilot_telegram_send_failed user_id=%s alert_id=%s rec_id=%s",
             user.user_id,
@@ -795,7 +900,7 @@ def _send_confirm_payload(db: Session, chat_id: str, rec: AiRecommendation) -> N
         logger.error("execution_enabled_guard_triggered rec_id=%s user_id=%s", rec.id, rec.user_id)
         send_telegram_message(chat_id, "Execution is disabled in this environment.")
         return
-    alert = db.query(Alert).filter(Alert.id == rec.alert_id).one_or_none()
+    alert = db.get(Alert, rec.alert_id)
 
     lines = ["<b>Confirmed (manual only).</b>"]
     if alert:
@@ -815,14 +920,18 @@ def _format_ai_message(
     evidence: list[str],
     signal_speed: str = SIGNAL_SPEED_STANDARD,
     window_minutes: int | None = None,
+    metrics: EvidenceMetrics | None = None,
 ) -> tuple[str, dict[str, Any]]:
+    view = _alert_view(alert)
     title = html.escape(alert.title[:160])
-    p_yes = _format_p_yes(alert)
-    move = _format_move(alert)
+    p_yes = _format_p_yes(view)
+    move = _format_move(view)
     liq = _format_liquidity(alert)
     evidence_block = _format_evidence_lines(evidence)
-    rationale_parts = _sanitize_threshold_claims(_split_bullet_text(rec.rationale), alert)
-    risk_parts = _sanitize_threshold_claims(_split_bullet_text(rec.risks), alert)
+    if metrics is None:
+        metrics = _parse_evidence_metrics(evidence)
+    rationale_parts = _sanitize_threshold_claims(_split_bullet_text(rec.rationale), view)
+    risk_parts = _sanitize_threshold_claims(_split_bullet_text(rec.risks), view)
     rationale = _format_bullet_parts(rationale_parts)
     rationale_header = "<b>Rationale</b>"
     risks_header = "<b>Risks</b>"
@@ -834,7 +943,7 @@ def _format_ai_message(
         rr_note = _extreme_prob_risk_reward(alert)
         if rr_note and rr_note not in risk_parts:
             risk_parts.append(rr_note)
-        what_changes_block = _format_bullet_parts(_build_wait_change_signals(alert, evidence))
+        what_changes_block = _format_bullet_parts(_build_wait_change_signals(alert, metrics, view))
     risks = _format_bullet_parts(risk_parts)
 
     display_action = rec.recommendation
@@ -842,71 +951,50 @@ def _format_ai_message(
     signal_window = window_minutes
     if signal_speed == SIGNAL_SPEED_FAST:
         if signal_window is None:
-            signal_window = _parse_window_minutes_from_evidence(evidence)
+            signal_window = metrics.window_minutes
         if signal_window is None:
             signal_window = 0
         if rec.recommendation in {"WAIT", "SKIP"}:
             display_action = "WATCH"
         header = f"<b>FAST Copilot: {display_action} (Early Signal)</b>"
 
-    lines = [
-        header,
-    ]
+    signal_line = ""
     if signal_speed == SIGNAL_SPEED_FAST:
-        context_window = _parse_window_minutes_from_evidence(evidence) or signal_window or 0
-        lines.append(f"Signal window: {signal_window}m | Context window: {context_window}m")
-    lines.extend(
-        [
-            title,
-            f"Move: {move} | {p_yes}",
-            liq,
-            "",
-            "<b>Evidence</b>",
-            evidence_block,
-            "",
-            rationale_header,
-            rationale,
-            "",
-            risks_header,
-            risks,
-        ]
-    )
+        context_window = metrics.window_minutes or signal_window or 0
+        signal_line = f"\nSignal window: {signal_window}m | Context window: {context_window}m"
+    what_changes = ""
     if what_changes_block:
-        lines.extend(["", "<b>What would change this view</b>", what_changes_block])
-
-    lines.extend(
-        [
-            "",
-            _format_market_link(alert.market_id, getattr(alert, "market_slug", None)),
-        ]
+        what_changes = f"\n\n<b>What would change this view</b>\n{what_changes_block}"
+    text = AI_MESSAGE_TEMPLATE.format(
+        header=header,
+        signal_line=signal_line,
+        title=title,
+        move=move,
+        p_yes=p_yes,
+        liq=liq,
+        evidence=evidence_block,
+        rationale_header=rationale_header,
+        rationale=rationale,
+        risks_header=risks_header,
+        risks=risks,
+        what_changes=what_changes,
+        link=_format_market_link(alert.market_id, getattr(alert, "market_slug", None)),
+        footer=COPILOT_FOOTER,
     )
-    lines.extend(["", COPILOT_FOOTER])
-    keyboard: list[list[dict[str, Any]]] = []
+    keyboard: list[list[dict[str, Any]]] = [
+        [{"text": "Mute theme 24h", "callback_data": MUTE_THEME_CALLBACK.format(alert_id=alert.id)}],
+        [{"text": "Mute market 24h", "callback_data": MUTE_MARKET_CALLBACK.format(alert_id=alert.id)}],
+    ]
     if rec.recommendation == "BUY":
-        keyboard.append(
+        keyboard.insert(
+            0,
             [
-                {"text": "Confirm", "callback_data": f"confirm:{rec.id}"},
-                {"text": "Skip", "callback_data": f"skip:{rec.id}"},
-            ]
+                {"text": "Confirm", "callback_data": CONFIRM_CALLBACK.format(rec_id=rec.id)},
+                {"text": "Skip", "callback_data": SKIP_CALLBACK.format(rec_id=rec.id)},
+            ],
         )
-    keyboard.append(
-        [
-            {
-                "text": "Mute theme 24h",
-                "callback_data": f"mute:theme_alert:{alert.id}:1440",
-            }
-        ]
-    )
-    keyboard.append(
-        [
-            {
-                "text": "Mute market 24h",
-                "callback_data": f"mute:market_alert:{alert.id}:1440",
-            }
-        ]
-    )
     markup = {"inline_keyboard": keyboard}
-    return "\n".join(lines), markup
+    return text, markup
 
 
 def _build_llm_context(
@@ -948,55 +1036,71 @@ def record_ai_event(db: Session, rec: AiRecommendation, action: str, details: st
         details=details,
     )
     db.add(event)
-    db.commit()
 
 
 def _theme_key_for_alert(alert: Alert) -> str:
-    extracted = extract_theme(alert.title or "", category=alert.category, slug=alert.market_id)
-    return extracted.theme_key
+    return extract_theme(alert.title or "", category=alert.category, slug=alert.market_id).theme_key
 
 
 def _is_muted(db: Session, user_id, market_id: str, theme_key: str, now_ts: datetime) -> bool:
     market_muted = (
-        db.query(AiMarketMute)
+        db.query(AiMarketMute.id)
         .filter(
             AiMarketMute.user_id == user_id,
             AiMarketMute.market_id == market_id,
             AiMarketMute.expires_at > now_ts,
         )
-        .count()
-        > 0
+        .exists()
     )
-    if market_muted:
-        return True
-    return (
-        db.query(AiThemeMute)
+    theme_muted = (
+        db.query(AiThemeMute.id)
         .filter(
             AiThemeMute.user_id == user_id,
             AiThemeMute.theme_key == theme_key,
             AiThemeMute.expires_at > now_ts,
         )
-        .count()
-        > 0
+        .exists()
     )
+    return bool(db.query(or_(market_muted, theme_muted)).scalar())
+
+
+def bulk_is_muted(
+    db: Session,
+    user_id,
+    pairs: list[tuple[str, str]],
+    now_ts: datetime,
+) -> dict[tuple[str, str], bool]:
+    if not pairs:
+        return {}
+    market_ids = {market_id for market_id, _ in pairs}
+    theme_keys = {theme_key for _, theme_key in pairs}
+    muted_market_ids = {
+        market_id
+        for (market_id,) in db.query(AiMarketMute.market_id).filter(
+            AiMarketMute.user_id == user_id,
+            AiMarketMute.market_id.in_(market_ids),
+            AiMarketMute.expires_at > now_ts,
+        )
+    }
+    muted_theme_keys = {
+        theme_key
+        for (theme_key,) in db.query(AiThemeMute.theme_key).filter(
+            AiThemeMute.user_id == user_id,
+            AiThemeMute.theme_key.in_(theme_keys),
+            AiThemeMute.expires_at > now_ts,
+        )
+    }
+    return {
+        (market_id, theme_key): market_id in muted_market_ids or theme_key in muted_theme_keys
+        for market_id, theme_key in pairs
+    }
 
 
 def _lookup_user_by_chat(db: Session, chat_id: int | str | None) -> User | None:
     normalized = _normalize_chat_id(chat_id)
     if normalized is None:
         return None
-    rows = (
-        db.query(User)
-        .filter(User.telegram_chat_id == normalized)
-        .order_by(User.created_at.desc())
-        .limit(2)
-        .all()
-    )
-    if not rows:
-        return None
-    if len(rows) > 1:
-        logger.warning("telegram_chat_id_multiple_users chat_id=%s count=%s", chat_id, len(rows))
-    return rows[0]
+    return db.query(User).filter(User.telegram_chat_id == normalized).first()
 
 
 def _split_bullet_text(text: str) -> list[str]:
@@ -1005,35 +1109,34 @@ def _split_bullet_text(text: str) -> list[str]:
     return [part.strip(" -") for part in text.replace("\n", ";").split(";") if part.strip()]
 
 
-def _sanitize_threshold_claims(parts: list[str], alert: Alert) -> list[str]:
+def _mentions_threshold(part: str) -> bool:
+    # Every _THRESHOLD_RE match contains "15" or "85"; skip the regex when neither is present.
+    if "15" not in part and "85" not in part:
+        return False
+    return _THRESHOLD_RE.search(part) is not None
+
+
+def _sanitize_threshold_claims(parts: list[str], view: AlertView) -> list[str]:
     if not parts:
         return parts
-    p_value = alert.market_p_yes
-    threshold_pattern = re.compile(
-        r"(?:\b0?\.?15\b|\b15%\b|\b15\s*percent\b|\b0?\.?85\b|\b85%\b|\b85\s*percent\b)",
-        re.IGNORECASE,
-    )
-    filtered = [part for part in parts if not threshold_pattern.search(part)]
+    p_value = view.p_yes
+    filtered = [part for part in parts if not _mentions_threshold(part)]
     if p_value is None:
         return filtered
-    low = p_value < defaults.DEFAULT_P_MIN
-    high = p_value > defaults.DEFAULT_P_MAX
-    if not (low or high):
+    if p_value < _P_MIN:
+        suffix = _P_MIN_SKEW_SUFFIX
+    elif p_value > _P_MAX:
+        suffix = _P_MAX_SKEW_SUFFIX
+    else:
         return filtered
-    label = _format_probability_label(alert)
-    pct = p_value * 100
-    threshold_pct = defaults.DEFAULT_P_MIN * 100 if low else defaults.DEFAULT_P_MAX * 100
-    direction = "below" if low else "above"
-    filtered.append(
-        f"Risk/reward skew: {label} at {pct:.1f}% is {direction} {threshold_pct:.0f}%."
-    )
+    filtered.append(f"Risk/reward skew: {view.p_label} at {p_value * 100:.1f}% is {suffix}")
     return filtered
 
 
 def _format_bullet_parts(parts: list[str]) -> str:
     if not parts:
         return "- (none)"
-    return "\n".join(f"- {html.escape(part)}" for part in parts[:4])
+    return "- " + "\n- ".join(map(html.escape, parts[:4]))
 
 
 def _format_bullets(text: str) -> str:
@@ -1044,62 +1147,50 @@ def _extreme_prob_risk_reward(alert: Alert) -> str | None:
     p_yes = alert.market_p_yes
     if p_yes is None:
         return None
-    if p_yes <= defaults.DEFAULT_P_MIN:
-        return "Risk/reward skewed at low prices: limited upside vs a larger mean-reversion swing."
-    if p_yes >= defaults.DEFAULT_P_MAX:
-        return "Risk/reward skewed at high prices: limited upside vs a larger downside on pullback."
+    if p_yes <= _P_MIN:
+        return RR_SKEW_LOW_NOTE
+    if p_yes >= _P_MAX:
+        return RR_SKEW_HIGH_NOTE
     return None
 
 
-def _parse_sustained_from_evidence(evidence: list[str]) -> tuple[int | None, int | None]:
-    pattern = re.compile(
-        r"(?:Sustained move across|Observed across) (\d+) snapshots .*?\(~?(\d+)m\)"
-    )
-    for line in evidence:
-        match = pattern.search(line)
-        if match:
-            return int(match.group(1)), int(match.group(2))
-    return None, None
-
-
-def _parse_abs_move_from_evidence(evidence: list[str]) -> float | None:
-    pattern = re.compile(r"Abs move: [+-]?([0-9.]+)")
+def _parse_evidence_metrics(evidence: list[str]) -> EvidenceMetrics:
+    sustained_snapshots = None
+    sustained_minutes = None
+    abs_move = None
+    abs_move_done = False
+    abs_window = None
     for line in evidence:
-        match = pattern.search(line)
-        if match:
-            try:
-                return float(match.group(1))
-            except ValueError:
-                return None
-    return None
-
-
-def _parse_window_minutes_from_evidence(evidence: list[str]) -> int | None:
-    abs_move_pattern = re.compile(r"Abs move: .*?\((\d+)m\)")
-    sustained_pattern = re.compile(
-        r"(?:Sustained move across|Observed across) \d+ snapshots .*?\(~?(\d+)m\)"
+        if sustained_snapshots is None:
+            match = _SUSTAINED_RE.search(line)
+            if match:
+                sustained_snapshots = int(match.group(1))
+                sustained_minutes = int(match.group(2))
+        if not abs_move_done:
+            match = _ABS_MOVE_RE.search(line)
+            if match:
+                abs_move_done = True
+                try:
+                    abs_move = float(match.group(1))
+                except ValueError:
+                    abs_move = None
+        if abs_window is None:
+            match = _WINDOW_ABS_RE.search(line)
+            if match:
+                abs_window = int(match.group(1))
+        if sustained_snapshots is not None and abs_move_done and abs_window is not None:
+            break
+    return EvidenceMetrics(
+        sustained_snapshots=sustained_snapshots,
+        sustained_minutes=sustained_minutes,
+        abs_move=abs_move,
+        window_minutes=abs_window if abs_window is not None else sustained_minutes,
     )
-    for line in evidence:
-        match = abs_move_pattern.search(line)
-        if match:
-            try:
-                return int(match.group(1))
-            except ValueError:
-                return None
-    for line in evidence:
-        match = sustained_pattern.search(line)
-        if match:
-            try:
-                return int(match.group(1))
-            except ValueError:
-                return None
-    return None
 
 
-def _fast_buy_allowed(alert: Alert, evidence: list[str]) -> bool:
-    abs_move = _parse_abs_move_from_evidence(evidence) or abs(_signed_price_delta(alert))
-    sustained_snapshots, _ = _parse_sustained_from_evidence(evidence)
-    sustained_count = sustained_snapshots or 0
+def _fast_buy_allowed(alert: Alert, metrics: EvidenceMetrics) -> bool:
+    abs_move = metrics.abs_move or abs(_signed_price_delta(alert))
+    sustained_count = metrics.sustained_snapshots or 0
     return abs_move >= 0.06 and sustained_count >= 3
 
 
@@ -1108,6 +1199,7 @@ def _apply_fast_recommendation_rules(
     alert: Alert,
     evidence: list[str],
     signal_speed: str,
+    metrics: EvidenceMetrics | None = None,
 ) -> dict[str, str]:
     if signal_speed != SIGNAL_SPEED_FAST:
         return llm_result
@@ -1123,7 +1215,7 @@ def _apply_fast_recommendation_rules(
         return llm_result
     if llm_result.get("recommendation") != "BUY":
         return llm_result
-    if _fast_buy_allowed(alert, evidence):
+    if _fast_buy_allowed(alert, metrics or _parse_evidence_metrics(evidence)):
         return llm_result
     return {
         "recommendation": "WAIT",
@@ -1133,12 +1225,12 @@ def _apply_fast_recommendation_rules(
     }
 
 
-def _build_wait_change_signals(alert: Alert, evidence: list[str]) -> list[str]:
+def _build_wait_change_signals(alert: Alert, metrics: EvidenceMetrics, view: AlertView) -> list[str]:
     signals: list[str] = []
-    direction = "up" if _signed_price_delta(alert) >= 0 else "down"
+    direction = "up" if view.direction >= 0 else "down"
     liquidity = alert.liquidity or 0.0
     volume_24h = alert.volume_24h or 0.0
-    sustained_count, _sustained_minutes = _parse_sustained_from_evidence(evidence)
+    sustained_count = metrics.sustained_snapshots
     if sustained_count is not None and sustained_count < 3:
         needed = max(3 - sustained_count, 1)
         signals.append(f"{needed} more snapshot(s) confirm the {direction} move.")
@@ -1147,7 +1239,7 @@ def _build_wait_change_signals(alert: Alert, evidence: list[str]) -> list[str]:
     if len(signals) < 2 and volume_24h < defaults.STRONG_MIN_VOLUME_24H:
         signals.append(f"24h volume clears ${defaults.STRONG_MIN_VOLUME_24H:,.0f}.")
     if not signals:
-        move_abs = _parse_abs_move_from_evidence(evidence) or abs(_signed_price_delta(alert))
+        move_abs = metrics.abs_move or abs(view.delta)
         if move_abs > 0:
             signals.append(f"Move extends another {move_abs:.3f} without reversal.")
         else:
@@ -1155,22 +1247,21 @@ def _build_wait_change_signals(alert: Alert, evidence: list[str]) -> list[str]:
     return signals[:2]
 
 
-def _format_p_yes(alert: Alert) -> str:
-    label = _format_probability_label(alert)
-    if alert.market_p_yes is None:
-        return f"{label}: n/a"
-    return f"{label}: {alert.market_p_yes * 100:.1f}%"
+def _format_p_yes(view: AlertView) -> str:
+    if view.p_yes is None:
+        return f"{view.p_label}: n/a"
+    return f"{view.p_label}: {view.p_yes * 100:.1f}%"
 
 
 def _format_probability_label(alert: Alert) -> str:
-    market_kind = getattr(alert, "market_kind", None)
-    is_yesno = getattr(alert, "is_yesno", None)
+    market_kind = alert.market_kind
+    is_yesno = alert.is_yesno
     if market_kind == "yesno" or is_yesno is True:
         return "p_yes"
-    mapping_confidence = getattr(alert, "mapping_confidence", None)
+    mapping_confidence = alert.mapping_confidence
     if mapping_confidence != "verified":
         return "p_outcome0"
-    label = getattr(alert, "primary_outcome_label", None)
+    label = alert.primary_outcome_label
     sanitized = _sanitize_outcome_label(label)
     if not sanitized:
         return "p_outcome0"
@@ -1179,10 +1270,11 @@ def _format_probability_label(alert: Alert) -> str:
     return f"p_{sanitized}"
 
 
+@lru_cache(maxsize=1024)
 def _sanitize_outcome_label(label: str | None) -> str | None:
     if not label:
         return None
-    cleaned = "".join(ch if ch.isalnum() else "_" for ch in str(label).strip()).strip("_")
+    cleaned = _NON_ALNUM_RE.sub("_", str(label).strip()).strip("_")
     if not cleaned:
         return None
     cleaned = cleaned.upper()
@@ -1191,16 +1283,16 @@ def _sanitize_outcome_label(label: str | None) -> str | None:
     return cleaned
 
 
-def _format_move(alert: Alert) -> str:
-    delta = _signed_price_delta(alert)
-    sign = "+" if delta >= 0 else "-"
-    return f"{sign}{abs(delta):.3f}"
+def _format_move(view: AlertView) -> str:
+    sign = "+" if view.delta >= 0 else "-"
+    return f"{sign}{abs(view.delta):.3f}"
 
 
 def _format_liquidity(alert: Alert) -> str:
     return f"Liquidity: ${alert.liquidity:,.0f} | Volume: ${alert.volume_24h:,.0f}"
 
 
+@lru_cache(maxsize=MARKET_LINK_CACHE_SIZE)
 def _format_market_link(market_id: str, slug: str | None = None) -> str:
     return market_url(market_id, slug)
 
@@ -1211,6 +1303,16 @@ def _signed_price_delta(alert: Alert) -> float:
     return alert.move or 0.0
 
 
+def _alert_view(alert: Alert) -> AlertView:
+    delta = _signed_price_delta(alert)
+    return AlertView(
+        delta=delta,
+        direction=1 if delta >= 0 else -1,
+        p_yes=alert.market_p_yes,
+        p_label=_format_probability_label(alert),
+    )
+
+
 def _callback_already_processed(callback_id: str) -> bool:
     key = CALLBACK_SEEN_KEY.format(callback_id=callback_id)
     try:
@@ -1235,23 +1337,15 @@ def _claim_copilot_theme(
 ) -> CopilotThemeClaim:
     ttl_seconds = max(int(ttl_minutes * 60), 60)
     key = _copilot_theme_dedupe_key(user_id, theme_key, signal_speed)
-    ttl_remaining: int | None = None
     try:
-        marked = redis_conn.set(key, "1", nx=True, ex=ttl_seconds)
-        if marked:
-            return CopilotThemeClaim(True, key, ttl_seconds, ttl_seconds)
-        ttl_remaining = redis_conn.ttl(key)
-        if ttl_remaining is not None and ttl_remaining < 0:
-            ttl_remaining = None
-        if ttl_remaining is None:
-            try:
-                redis_conn.expire(key, ttl_seconds)
-            except Exception:
-                logger.exception("copilot_theme_dedupe_expire_reset_failed user_id=%s theme_key=%s", user_id, theme_key)
+        claimed, ttl_remaining = _CLAIM_THEME_SCRIPT(keys=[key], args=[ttl_seconds], client=redis_conn)
     except Exception:
         logger.exception("copilot_theme_dedupe_failed user_id=%s theme_key=%s", user_id, theme_key)
         return CopilotThemeClaim(True, key, ttl_seconds, None)
-    return CopilotThemeClaim(False, key, ttl_seconds, ttl_remaining)
+    if int(claimed):
+        return CopilotThemeClaim(True, key, ttl_seconds, ttl_seconds)
+    ttl_remaining = int(ttl_remaining)
+    return CopilotThemeClaim(False, key, ttl_seconds, ttl_remaining if ttl_remaining >= 0 else None)
 
 
 def _release_copilot_theme(key: str, retry_ttl_seconds: int | None = None) -> None:
@@ -1277,25 +1371,30 @@ def _extend_copilot_theme_ttl(key: str, ttl_seconds: int) -> None:
 
 
 def _clear_message_actions(chat_id: str | None, message_id: Any) -> None:
-    if not chat_id or not message_id:
+    if not chat_id or not message_id or not settings.TELEGRAM_BOT_TOKEN:
         return
-    edit_message_reply_markup(str(chat_id), str(message_id), {"inline_keyboard": []})
+    try:
+        queue.enqueue(edit_message_reply_markup, str(chat_id), str(message_id), {"inline_keyboard": []})
+    except Exception:
+        logger.exception("telegram_clear_actions_enqueue_failed chat_id=%s message_id=%s", chat_id, message_id)
 
 
 def _format_evidence_lines(evidence: list[str]) -> str:
     if not evidence:
         return "- Insufficient snapshot data."
-    return "\n".join(f"- {html.escape(line)}" for line in evidence[:4])
+    return "- " + "\n- ".join(map(html.escape, evidence[:4]))
 
 
 def _build_evidence(db: Session, alert: Alert) -> list[str]:
-    points = _load_price_points(db, alert, max_points=6)
+    points = load_price_points(db, alert, max_points=6)
     if not points:
         return []
-    direction = _price_direction(alert)
-    sustained_count, sustained_minutes = _sustained_snapshot_streak(points, direction)
-    window_minutes = _points_window_minutes(points)
-    move_abs = abs(_signed_price_delta(alert))
+    delta = _signed_price_delta(alert)
+    direction = 1 if delta >= 0 else -1
+    times, prices = zip(*points)
+    sustained_count, sustained_minutes = _sustained_snapshot_streak(times, prices, direction)
+    window_minutes = _points_window_minutes(times)
+    move_abs = abs(delta)
     move_pct = abs((alert.delta_pct or 0.0) * 100)
     sign = "+" if direction >= 0 else "-"
 
@@ -1313,91 +1412,55 @@ def _build_evidence(db: Session, alert: Alert) -> list[str]:
         f"Observed across {sustained_count} snapshots (~{sustained_minutes}m) within context window",
         f"Abs move: {sign}{move_abs:.3f} | pct: {sign}{move_pct:.1f}% ({window_minutes}m)",
         f"Liquidity: {liq_descriptor} {_format_usd(alert.liquidity)} | Vol24h: {vol_descriptor} {_format_usd(alert.volume_24h)}",
-        _reversal_line(points, direction, window_minutes, move_abs),
+        _reversal_line(prices, direction, window_minutes, move_abs),
     ]
     return evidence
 
 
-def _load_price_points(db: Session, alert: Alert, max_points: int) -> list[tuple[datetime, float]]:
-    if alert.snapshot_bucket is None:
-        return []
-    before = (
-        db.query(MarketSnapshot.snapshot_bucket, MarketSnapshot.market_p_yes)
-        .filter(
-            MarketSnapshot.market_id == alert.market_id,
-            MarketSnapshot.snapshot_bucket <= alert.snapshot_bucket,
-            MarketSnapshot.market_p_yes.isnot(None),
-        )
-        .order_by(MarketSnapshot.snapshot_bucket.desc())
-        .limit(max_points)
-        .all()
-    )
-    after = (
-        db.query(MarketSnapshot.snapshot_bucket, MarketSnapshot.market_p_yes)
-        .filter(
-            MarketSnapshot.market_id == alert.market_id,
-            MarketSnapshot.snapshot_bucket >= alert.snapshot_bucket,
-            MarketSnapshot.market_p_yes.isnot(None),
-        )
-        .order_by(MarketSnapshot.snapshot_bucket.asc())
-        .limit(max_points)
-        .all()
-    )
-    points: dict[datetime, float] = {}
-    for bucket, price in before + after:
-        points[bucket] = price
-    return sorted(points.items(), key=lambda item: item[0])
-
-
-def _price_direction(alert: Alert) -> int:
-    if alert.new_price is not None and alert.old_price is not None:
-        return 1 if alert.new_price - alert.old_price >= 0 else -1
-    return 1 if (alert.move or 0.0) >= 0 else -1
-
-
 def _sustained_snapshot_streak(
-    points: list[tuple[datetime, float]],
+    times: Sequence[datetime],
+    prices: Sequence[float],
     direction: int,
 ) -> tuple[int, int]:
-    if len(points) < 2:
+    if len(prices) < 2:
         return 1, 0
     streak_deltas = 0
-    for idx in range(len(points) - 1, 0, -1):
-        delta = points[idx][1] - points[idx - 1][1]
-        if delta * direction > 0:
+    later = prices[-1]
+    for earlier in reversed(prices[:-1]):
+        if (later - earlier) * direction > 0:
             streak_deltas += 1
+            later = earlier
         else:
             break
-    streak_snapshots = max(streak_deltas + 1, 1)
     if streak_deltas == 0:
         return 1, 0
-    start_idx = len(points) - 1 - streak_deltas
-    minutes = int((points[-1][0] - points[start_idx][0]).total_seconds() / 60)
-    return streak_snapshots, minutes
+    start_idx = len(prices) - 1 - streak_deltas
+    minutes = int((times[-1] - times[start_idx]).total_seconds() / 60)
+    return streak_deltas + 1, minutes
 
 
-def _points_window_minutes(points: list[tuple[datetime, float]]) -> int:
-    if len(points) < 2:
+def _points_window_minutes(times: Sequence[datetime]) -> int:
+    if len(times) < 2:
         return 0
-    return int((points[-1][0] - points[0][0]).total_seconds() / 60)
+    return int((times[-1] - times[0]).total_seconds() / 60)
 
 
 def _reversal_line(
-    points: list[tuple[datetime, float]],
+    prices: Sequence[float],
     direction: int,
     window_minutes: int,
     move_abs: float,
 ) -> str:
-    if len(points) < 2 or move_abs <= 0:
+    if len(prices) < 2 or move_abs <= 0:
         return f"No reversal observed in last {window_minutes}m"
-    baseline = points[0][1]
-    last = points[-1][1]
+    baseline = prices[0]
+    last = prices[-1]
     if direction >= 0:
-        peak = max(price for _, price in points)
+        peak = max(prices)
         total_move = peak - baseline
         retrace = (peak - last) / total_move if total_move > 0 else 0
     else:
-        peak = min(price for _, price in points)
+        peak = min(prices)
         total_move = baseline - peak
         retrace = (last - peak) / total_move if total_move > 0 else 0
     if retrace > 0:
@@ -1,12 +1,21 @@
+from bisect import bisect_left
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from typing import Sequence
 
+from sqlalchemy import Integer, literal, select, union
 from sqlalchemy.orm import Session
 
 from ..models import Alert, MarketSnapshot
 from . import defaults
 
+PRICE_POINT_BATCH_SELECTS = 200
+_REPRICING_HIGH = ("REPRICING", "HIGH", "FOLLOW")
+_REPRICING_MEDIUM = ("REPRICING", "MEDIUM", "FOLLOW")
+_LIQUIDITY_SWEEP = ("LIQUIDITY_SWEEP", "MEDIUM", "WAIT")
+_NOISY = ("NOISY", "LOW", "IGNORE")
+
 
 class AlertClass(str, Enum):
     ACTIONABLE_FAST = "ACTIONABLE_FAST"
@@ -53,111 +62,23 @@ def classify_alert(
     )
 
     if low_base_price:
-        return _with_class(
-            AlertClassification(
-                "NOISY",
-                "LOW",
-                "IGNORE",
-                market_kind=getattr(alert, "market_kind", None),
-                abs_move=abs_move,
-                pct_move=pct_move,
-                sustained=behavior.sustained,
-            )
-        )
-
-    if behavior.sustained and not behavior.reversal and high_liquidity and high_volume:
-        return _with_class(
-            AlertClassification(
-                "REPRICING",
-                "HIGH",
-                "FOLLOW",
-                market_kind=getattr(alert, "market_kind", None),
-                abs_move=abs_move,
-                pct_move=pct_move,
-                sustained=behavior.sustained,
-            )
-        )
-    if behavior.sustained and not behavior.reversal and large_move and moderate_liquidity and moderate_volume:
-        return _with_class(
-            AlertClassification(
-                "REPRICING",
-                "MEDIUM",
-                "FOLLOW",
-                market_kind=getattr(alert, "market_kind", None),
-                abs_move=abs_move,
-                pct_move=pct_move,
-                sustained=behavior.sustained,
-            )
-        )
-
-    if large_move and (behavior.reversal or not behavior.sustained):
-        if moderate_liquidity or moderate_volume:
-            return _with_class(
-                AlertClassification(
-                    "LIQUIDITY_SWEEP",
-                    "MEDIUM",
-                    "WAIT",
-                    market_kind=getattr(alert, "market_kind", None),
-                    abs_move=abs_move,
-                    pct_move=pct_move,
-                    sustained=behavior.sustained,
-                )
-            )
-        return _with_class(
-            AlertClassification(
-                "NOISY",
-                "LOW",
-                "IGNORE",
-                market_kind=getattr(alert, "market_kind", None),
-                abs_move=abs_move,
-                pct_move=pct_move,
-                sustained=behavior.sustained,
-            )
-        )
-
-    if moderate_move and (behavior.reversal or behavior.flatline):
-        if moderate_liquidity or moderate_volume:
-            return _with_class(
-                AlertClassification(
-                    "LIQUIDITY_SWEEP",
-                    "MEDIUM",
-                    "WAIT",
-                    market_kind=getattr(alert, "market_kind", None),
-                    abs_move=abs_move,
-                    pct_move=pct_move,
-                    sustained=behavior.sustained,
-                )
-            )
-        return _with_class(
-            AlertClassification(
-                "NOISY",
-                "LOW",
-                "IGNORE",
-                market_kind=getattr(alert, "market_kind", None),
-                abs_move=abs_move,
-                pct_move=pct_move,
-                sustained=behavior.sustained,
-            )
-        )
-
-    if moderate_move and moderate_liquidity and moderate_volume and behavior.sustained:
-        return _with_class(
-            AlertClassification(
-                "LIQUIDITY_SWEEP",
-                "MEDIUM",
-                "WAIT",
-                market_kind=getattr(alert, "market_kind", None),
-                abs_move=abs_move,
-                pct_move=pct_move,
-                sustained=behavior.sustained,
-            )
-        )
+        signal = _NOISY
+    elif behavior.sustained and not behavior.reversal and high_liquidity and high_volume:
+        signal = _REPRICING_HIGH
+    elif behavior.sustained and not behavior.reversal and large_move and moderate_liquidity and moderate_volume:
+        signal = _REPRICING_MEDIUM
+    elif large_move and (behavior.reversal or not behavior.sustained):
+        signal = _LIQUIDITY_SWEEP if moderate_liquidity or moderate_volume else _NOISY
+    elif moderate_move and (behavior.reversal or behavior.flatline):
+        signal = _LIQUIDITY_SWEEP if moderate_liquidity or moderate_volume else _NOISY
+    elif moderate_move and moderate_liquidity and moderate_volume and behavior.sustained:
+        signal = _LIQUIDITY_SWEEP
+    else:
+        signal = _NOISY
 
     return _with_class(
         AlertClassification(
-            "NOISY",
-            "LOW",
-            "IGNORE",
+            *signal,
             market_kind=getattr(alert, "market_kind", None),
             abs_move=abs_move,
             pct_move=pct_move,
@@ -167,10 +88,18 @@ def classify_alert(
 
 
 def classify_alert_with_snapshots(db: Session, alert: Alert) -> AlertClassification:
-    price_points = _load_price_points(db, alert)
+    price_points = load_price_points(db, alert)
     return classify_alert(alert, price_points=price_points)
 
 
+def classify_alerts_with_snapshots(db: Session, alerts: Sequence[Alert]) -> list[AlertClassification]:
+    points_by_index = _load_price_points_batch(db, alerts)
+    return [
+        classify_alert(alert, price_points=points_by_index.get(index, []))
+        for index, alert in enumerate(alerts)
+    ]
+
+
 def _alert_abs_move(alert: Alert) -> float:
     if alert.old_price is not None and alert.new_price is not None:
         return abs(alert.new_price - alert.old_price)
@@ -189,35 +118,46 @@ def _alert_pct_move(alert: Alert, abs_move: float) -> float | None:
     return None
 
 
-def _load_price_points(db: Session, alert: Alert, max_points: int = 5) -> list[tuple[datetime, float]]:
-    if alert.snapshot_bucket is None:
-        return []
-    before = (
-        db.query(MarketSnapshot.snapshot_bucket, MarketSnapshot.market_p_yes)
-        .filter(
+def load_price_points(db: Session, alert: Alert, max_points: int = 5) -> list[tuple[datetime, float]]:
+    return _load_price_points_batch(db, [alert], max_points).get(0, [])
+
+
+def _load_price_points_batch(
+    db: Session,
+    alerts: Sequence[Alert],
+    max_points: int = 5,
+) -> dict[int, list[tuple[datetime, float]]]:
+    selects = []
+    for index, alert in enumerate(alerts):
+        if alert.snapshot_bucket is None:
+            continue
+        base = select(
+            literal(index, Integer).label("alert_index"),
+            MarketSnapshot.snapshot_bucket,
+            MarketSnapshot.market_p_yes,
+        ).where(
             MarketSnapshot.market_id == alert.market_id,
-            MarketSnapshot.snapshot_bucket <= alert.snapshot_bucket,
             MarketSnapshot.market_p_yes.isnot(None),
         )
-        .order_by(MarketSnapshot.snapshot_bucket.desc())
-        .limit(max_points)
-        .all()
-    )
-    after = (
-        db.query(MarketSnapshot.snapshot_bucket, MarketSnapshot.market_p_yes)
-        .filter(
-            MarketSnapshot.market_id == alert.market_id,
-            MarketSnapshot.snapshot_bucket >= alert.snapshot_bucket,
-            MarketSnapshot.market_p_yes.isnot(None),
+        before = (
+            base.where(MarketSnapshot.snapshot_bucket <= alert.snapshot_bucket)
+            .order_by(MarketSnapshot.snapshot_bucket.desc())
+            .limit(max_points)
+            .subquery()
         )
-        .order_by(MarketSnapshot.snapshot_bucket.asc())
-        .limit(max_points)
-        .all()
-    )
-    points: dict[datetime, float] = {}
-    for bucket, price in before + after:
-        points[bucket] = price
-    return sorted(points.items(), key=lambda item: item[0])
+        after = (
+            base.where(MarketSnapshot.snapshot_bucket >= alert.snapshot_bucket)
+            .order_by(MarketSnapshot.snapshot_bucket.asc())
+            .limit(max_points)
+            .subquery()
+        )
+        selects.extend((select(before), select(after)))
+    points: dict[int, list[tuple[datetime, float]]] = {}
+    for start in range(0, len(selects), PRICE_POINT_BATCH_SELECTS):
+        rows = db.execute(union(*selects[start : start + PRICE_POINT_BATCH_SELECTS])).all()
+        for index, bucket, price in rows:
+            points.setdefault(index, []).append((bucket, price))
+    return {index: sorted(rows) for index, rows in points.items()}
 
 
 def _analyze_price_behavior(
@@ -230,29 +170,34 @@ def _analyze_price_behavior(
     points = sorted(price_points, key=lambda item: item[0])
     direction = 1 if (alert.new_price or 0.0) - (alert.old_price or 0.0) >= 0 else -1
 
-    idx = min(
-        range(len(points)),
-        key=lambda i: abs((points[i][0] - alert.snapshot_bucket).total_seconds()),
-    )
-    post = points[idx:]
-    deltas = [post[i + 1][1] - post[i][1] for i in range(len(post) - 1)]
-    sustained = False
-    for i in range(len(deltas) - 1):
-        if _delta_matches(deltas[i], direction) and _delta_matches(deltas[i + 1], direction):
-            sustained = True
+    post = points[_nearest_point_index([bucket for bucket, _ in points], alert.snapshot_bucket):]
+    old_price = alert.old_price or 0.0
+    sustained = reversal = previous_match = False
+    flatline = len(post) > 1
+    for (_, earlier), (_, later) in zip(post, post[1:]):
+        delta = later - earlier
+        matches = _delta_matches(delta, direction)
+        sustained = sustained or (previous_match and matches)
+        previous_match = matches
+        reversal = (
+            reversal
+            or _delta_matches(delta, -direction)
+            or abs(later - old_price) < defaults.MEDIUM_ABS_MOVE_THRESHOLD
+        )
+        flatline = flatline and abs(delta) < defaults.MEDIUM_ABS_MOVE_THRESHOLD
+        if sustained and reversal and not flatline:
             break
 
-    reversal = any(_delta_matches(delta, -direction) for delta in deltas)
-    snapback = any(
-        abs(price - (alert.old_price or 0.0)) < defaults.MEDIUM_ABS_MOVE_THRESHOLD
-        for _, price in post[1:]
-    )
-    reversal = reversal or snapback
-    flatline = bool(deltas) and all(abs(delta) < defaults.MEDIUM_ABS_MOVE_THRESHOLD for delta in deltas)
-
     return AlertBehavior(sustained=sustained, reversal=reversal, flatline=flatline)
 
 
+def _nearest_point_index(times: list[datetime], target: datetime) -> int:
+    idx = bisect_left(times, target)
+    if idx == len(times) or (idx > 0 and target - times[idx - 1] <= times[idx] - target):
+        idx -= 1
+    return bisect_left(times, times[idx])
+
+
 def _delta_matches(delta: float, direction: int) -> bool:
     return delta * direction > 0 and abs(delta) >= defaults.MEDIUM_ABS_MOVE_THRESHOLD
 
@@ -5,9 +5,11 @@ import logging
 import re
 import time
 from collections import Counter
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from enum import Enum
+from functools import lru_cache
 from uuid import UUID, uuid4
 
 import httpx
@@ -20,9 +22,7 @@ from sqlalchemy.orm import Session
 from ..alerts.theme_key import extract_theme, normalize_text, strip_stopwords
 from ..jobs.ai import ai_recommendation_job
 from ..models import (
-    AiMarketMute,
     AiRecommendation,
-    AiThemeMute,
     Alert,
     AlertDelivery,
     MarketSnapshot,
@@ -32,10 +32,16 @@ from ..models import (
 from ..settings import settings
 from ..http_logging import HttpxTimer, log_httpx_response
 from . import defaults
-from .ai_copilot import init_copilot_run, log_copilot_run_summary, store_copilot_last_status
+from .ai_copilot import bulk_is_muted, init_copilot_run, log_copilot_run_summary, store_copilot_last_status
 from .alert_strength import AlertStrength
 from .user_settings import get_effective_user_settings
-from .alert_classification import AlertClass, AlertClassification, classify_alert, classify_alert_with_snapshots
+from .alert_classification import (
+    AlertClass,
+    AlertClassification,
+    classify_alert,
+    classify_alert_with_snapshots,
+    classify_alerts_with_snapshots,
+)
 from .fast_signals import FAST_ALERT_TYPE
 from .market_links import attach_market_slugs, market_url
 from .plans import upgrade_target_name
@@ -63,6 +69,22 @@ COPILOT_LAST_EVAL_TTL_SECONDS = 60 * 60 * 24
 DELIVERY_STATUS_SENT = "sent"
 DELIVERY_STATUS_SKIPPED = "skipped"
 DELIVERY_STATUS_FILTERED = "filtered"
+ALERT_DELIVERY_UPSERT_BATCH = 1000
+ALERT_DELIVERY_FLUSH_USERS = 10
+_OUTCOME_LABEL_SEPARATOR_RE = re.compile(r"[^A-Za-z0-9]+")
+_SHORT_TITLE_WILL_RE = re.compile(r"^\s*will\s+", re.IGNORECASE)
+_SHORT_TITLE_PRICE_OF_RE = re.compile(r"^\s*the\s+price\s+of\s+", re.IGNORECASE)
+_SHORT_TITLE_ON_TAIL_RE = re.compile(r"\s+on\s+.*$", re.IGNORECASE)
+_PRICE_RANGE_RE = re.compile(r"between\s+\$?([\d,]+(?:\.\d+)?)\s+and\s+\$?([\d,]+(?:\.\d+)?)")
+_ABOVE_BELOW_RE = re.compile(r"\b(above|below)\s+\$?([\d,]+(?:\.\d+)?)")
+_MATCHUP_RE = re.compile(r"\b([a-z0-9]+)\s+(?:vs|v)\s+([a-z0-9]+)\b")
+_ISO_DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_MONTH_DAY_RE = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|"
+    r"jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s+(\d{1,2})\b"
+)
+_ALNUM_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_WHITESPACE_RUN_RE = re.compile(r"\s+")
 
 _ALERT_DELIVERY_EXPIRES_CACHE: dict[str, bool] = {}
 
@@ -242,6 +264,8 @@ async def send_user_digests(db: Session, tenant_id: str) -> dict | None:
     results = []
     sent_count = 0
     skipped_no_plan = 0
+    now_ts = datetime.now(timezone.utc)
+    configs: list[UserDigestConfig] = []
     for user in users:
         if user.user_id not in active_subs:
             latest = latest_subs.get(user.user_id) if latest_subs else None
@@ -255,34 +279,68 @@ async def send_user_digests(db: Session, tenant_id: str) -> dict | None:
             )
             skipped_no_plan += 1
             continue
-        config = _resolve_user_preferences(user, prefs.get(user.user_id), db=db)
-        now_ts = datetime.now(timezone.utc)
-        fast_payload, _ = _prepare_fast_digest(
-            db,
-            tenant_id,
-            config,
-            now_ts,
-            include_footer=defaults.FAST_DIGEST_MODE == "separate",
-        )
-        append_fast = defaults.FAST_DIGEST_MODE == "append" and fast_payload is not None
-        if append_fast:
-            result = await _send_user_digest(db, tenant_id, config, fast_section=fast_payload.text)
-            if result.get("sent"):
-                _record_fast_digest_sent(config.user_id, now_ts)
-        else:
-            result = await _send_user_digest(db, tenant_id, config)
-            if defaults.FAST_DIGEST_MODE == "separate" and fast_payload is not None:
-                fast_result = await _send_user_fast_digest(
+        configs.append(_resolve_user_preferences(user, prefs.get(user.user_id)))
+
+    digest_alerts, fast_alerts = _load_digest_alerts(db, tenant_id, configs, now_ts)
+    last_sent = _load_digest_last_sent(configs)
+    filter_values = {id(alert): _alert_filter_values(alert) for alert in digest_alerts}
+    delivery_rows: dict[tuple[int, UUID], dict] = {}
+    classification_cache: dict[int, AlertClassification] = {}
+    async with httpx.AsyncClient(timeout=10) as http_client:
+        for index, config in enumerate(configs, start=1):
+            fast_payload, _ = _prepare_fast_digest(
+                db,
+                tenant_id,
+                config,
+                now_ts,
+                include_footer=defaults.FAST_DIGEST_MODE == "separate",
+                preloaded_alerts=fast_alerts,
+                last_sent=last_sent,
+            )
+            append_fast = defaults.FAST_DIGEST_MODE == "append" and fast_payload is not None
+            if append_fast:
+                result = await _send_user_digest(
                     db,
                     tenant_id,
                     config,
-                    fast_payload,
-                    now_ts,
+                    fast_section=fast_payload.text,
+                    http_client=http_client,
+                    preloaded_alerts=digest_alerts,
+                    delivery_rows=delivery_rows,
+                    last_sent=last_sent,
+                    classification_cache=classification_cache,
+                    filter_values=filter_values,
                 )
-                result["fast"] = fast_result
-        results.append(result)
-        if result.get("sent"):
-            sent_count += 1
+                if result.get("sent"):
+                    _record_fast_digest_sent(config.user_id, now_ts)
+            else:
+                result = await _send_user_digest(
+                    db,
+                    tenant_id,
+                    config,
+                    http_client=http_client,
+                    preloaded_alerts=digest_alerts,
+                    delivery_rows=delivery_rows,
+                    last_sent=last_sent,
+                    classification_cache=classification_cache,
+                    filter_values=filter_values,
+                )
+                if defaults.FAST_DIGEST_MODE == "separate" and fast_payload is not None:
+                    fast_result = await _send_user_fast_digest(
+                        db,
+                        tenant_id,
+                        config,
+                        fast_payload,
+                        now_ts,
+                        http_client=http_client,
+                    )
+                    result["fast"] = fast_result
+            results.append(result)
+            if result.get("sent"):
+                sent_count += 1
+            if index % ALERT_DELIVERY_FLUSH_USERS == 0 or len(delivery_rows) >= ALERT_DELIVERY_UPSERT_BATCH:
+                _flush_alert_deliveries(db, delivery_rows)
+    _flush_alert_deliveries(db, delivery_rows)
 
     if skipped_no_plan:
         logger.info(
@@ -300,6 +358,72 @@ async def send_user_digests(db: Session, tenant_id: str) -> dict | None:
     }
 
 
+def _load_digest_alerts(
+    db: Session,
+    tenant_id: str,
+    configs: list[UserDigestConfig],
+    now_ts: datetime,
+) -> tuple[list[Alert], list[Alert]]:
+    if not configs:
+        return [], []
+    digest_window = max(max(config.digest_window_minutes, 1) for config in configs)
+    digest_alerts = (
+        db.query(Alert)
+        .filter(
+            Alert.tenant_id == tenant_id,
+            Alert.created_at >= now_ts - timedelta(minutes=digest_window),
+            Alert.alert_type != FAST_ALERT_TYPE,
+        )
+        .all()
+    )
+    fast_windows = [max(config.fast_window_minutes, 1) for config in configs if config.fast_signals_enabled]
+    fast_alerts: list[Alert] = []
+    if settings.FAST_SIGNALS_GLOBAL_ENABLED and fast_windows:
+        fast_alerts = _fast_alert_query(db, tenant_id, now_ts - timedelta(minutes=max(fast_windows))).all()
+    # A commit during the per-user sends would otherwise expire these rows and reload them one by one.
+    for alert in digest_alerts + fast_alerts:
+        db.expunge(alert)
+    return digest_alerts, fast_alerts
+
+
+def _load_digest_last_sent(configs: list[UserDigestConfig]) -> dict[str, bytes | None]:
+    keys = [USER_DIGEST_LAST_SENT_KEY.format(user_id=config.user_id) for config in configs]
+    if settings.FAST_SIGNALS_GLOBAL_ENABLED:
+        keys.extend(
+            USER_FAST_DIGEST_LAST_SENT_KEY.format(user_id=config.user_id)
+            for config in configs
+            if config.fast_signals_enabled
+        )
+    if not keys:
+        return {}
+    try:
+        return dict(zip(keys, redis_conn.mget(keys)))
+    except Exception:
+        logger.exception("digest_last_sent_prefetch_failed users=%s", len(configs))
+        return {}
+
+
+def _fast_alert_query(db: Session, tenant_id: str, window_start: datetime):
+    return db.query(Alert).filter(
+        Alert.tenant_id == tenant_id,
+        Alert.alert_type == FAST_ALERT_TYPE,
+        Alert.created_at >= window_start,
+        Alert.liquidity >= defaults.FAST_MIN_LIQUIDITY,
+        Alert.volume_24h >= defaults.FAST_MIN_VOLUME_24H,
+    )
+
+
+def _alerts_created_since(alerts: list[Alert], window_start: datetime) -> list[Alert]:
+    recent = []
+    for alert in alerts:
+        created_at = alert.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        if created_at >= window_start:
+            recent.append(alert)
+    return recent
+
+
 def _load_user_preferences(
     db: Session,
     users: list[User],
@@ -397,11 +521,23 @@ def _note_filter_reason(
         reasons.append(reason)
 
 
+def _digest_http_client(http_client: httpx.AsyncClient | None):
+    if http_client is not None:
+        return nullcontext(http_client)
+    return httpx.AsyncClient(timeout=10)
+
+
 async def _send_user_digest(
     db: Session,
     tenant_id: str,
     config: UserDigestConfig,
     fast_section: str | None = None,
+    http_client: httpx.AsyncClient | None = None,
+    preloaded_alerts: list[Alert] | None = None,
+    delivery_rows: dict[tuple[int, UUID], dict] | None = None,
+    last_sent: dict[str, bytes | None] | None = None,
+    classification_cache: dict[int, AlertClassification] | None = None,
+    filter_values: dict[int, tuple[float, float, float, str]] | None = None,
 ) -> dict:
     run_id = str(uuid4())
     run_started_at = time.time()
@@ -423,7 +559,7 @@ async def _send_user_digest(
     hourly_limit = max(config.max_copilot_per_hour, 0)
     hourly_count = _get_copilot_hourly_count(config.user_id, now_ts)
 
-    if _digest_recently_sent(config.user_id, now_ts, window_minutes):
+    if _digest_recently_sent(config.user_id, now_ts, window_minutes, last_sent=last_sent):
         _emit_copilot_run_summary(
             run_id=run_id,
             run_started_at=run_started_at,
@@ -443,20 +579,24 @@ async def _send_user_digest(
             llm_calls_succeeded=0,
             telegram_sends_attempted=0,
             telegram_sends_succeeded=0,
+            now_ts=now_ts,
         )
         _log_digest_metrics(config.user_id, metrics, filter_reason_events)
         return {"user_id": str(config.user_id), "sent": False, "reason": "recent_digest"}
 
     window_start = now_ts - timedelta(minutes=window_minutes)
-    rows = (
-        db.query(Alert)
-        .filter(
-            Alert.tenant_id == tenant_id,
-            Alert.created_at >= window_start,
-            Alert.alert_type != FAST_ALERT_TYPE,
+    if preloaded_alerts is not None:
+        rows = _alerts_created_since(preloaded_alerts, window_start)
+    else:
+        rows = (
+            db.query(Alert)
+            .filter(
+                Alert.tenant_id == tenant_id,
+                Alert.created_at >= window_start,
+                Alert.alert_type != FAST_ALERT_TYPE,
+            )
+            .all()
         )
-        .all()
-    )
     metrics["candidate_alerts_count"] = len(rows)
     metrics["strong_count"] = sum(
         1 for alert in rows if alert.strength == AlertStrength.STRONG.value
@@ -481,6 +621,7 @@ async def _send_user_digest(
             llm_calls_succeeded=0,
             telegram_sends_attempted=0,
             telegram_sends_succeeded=0,
+            now_ts=now_ts,
         )
         if config.telegram_chat_id:
             no_alerts_text = _format_no_alerts_message(window_minutes)
@@ -492,7 +633,7 @@ async def _send_user_digest(
                 "disable_web_page_preview": True,
             }
             try:
-                async with httpx.AsyncClient(timeout=10) as client:
+                async with _digest_http_client(http_client) as client:
                     timer = HttpxTimer()
                     response = await client.post(url, json=payload)
                 log_httpx_response(response, timer.elapsed(), log_error=False)
@@ -508,16 +649,25 @@ async def _send_user_digest(
     included_alerts, filtered_out, base_filter_map, base_filter_reasons = _filter_alerts_for_user(
         rows,
         config,
+        filter_values,
     )
     filter_reasons_by_alert_id.update(base_filter_map)
     filter_reason_events.extend(base_filter_reasons)
     metrics["after_pref_filter_count"] = len(included_alerts)
     metrics["after_strength_gate_count"] = len(included_alerts)
 
-    classification_cache: dict[int, AlertClassification] = {}
+    if classification_cache is None:
+        classification_cache = {}
+    unclassified = [alert for alert in included_alerts if _classification_key(alert) not in classification_cache]
+    classification_cache.update(
+        zip(
+            map(_classification_key, unclassified),
+            classify_alerts_with_snapshots(db, unclassified),
+        )
+    )
 
     def classifier(alert: Alert) -> AlertClassification:
-        key = alert.id if alert.id is not None else id(alert)
+        key = _classification_key(alert)
         cached = classification_cache.get(key)
         if cached:
             return cached
@@ -564,6 +714,7 @@ async def _send_user_digest(
             llm_calls_succeeded=0,
             telegram_sends_attempted=0,
             telegram_sends_succeeded=0,
+            now_ts=now_ts,
         )
         _record_alert_deliveries(
             db,
@@ -574,6 +725,7 @@ async def _send_user_digest(
             sent_alert_ids=set(),
             skip_reason="missing_chat_id",
             filter_reasons=filter_reasons_by_alert_id,
+            delivery_rows=delivery_rows,
         )
         _log_digest_metrics(config.user_id, metrics, filter_reason_events)
         return {"user_id": str(config.user_id), "sent": False, "reason": "missing_chat_id"}
@@ -588,9 +740,9 @@ async def _send_user_digest(
         else:
             actionable_alerts.append(alert)
 
-    actionable_ranked = _dedupe_by_market_id(_rank_alerts(actionable_alerts))
+    actionable_ranked = _dedupe_by_market_id(_rank_alerts(actionable_alerts, filter_values))
     info_ranked = _dedupe_by_market_id(
-        _rank_alerts(info_only_alerts),
+        _rank_alerts(info_only_alerts, filter_values),
         exclude_market_ids={alert.market_id for alert in actionable_ranked},
     )
     total_actionable = len(actionable_ranked)
@@ -663,6 +815,7 @@ async def _send_user_digest(
             llm_calls_succeeded=0,
             telegram_sends_attempted=0,
             telegram_sends_succeeded=0,
+            now_ts=now_ts,
         )
     metrics["after_caps_count"] = len(selected_alerts)
     attach_market_slugs(db, selected_alerts)
@@ -677,7 +830,7 @@ async def _send_user_digest(
             "disable_web_page_preview": True,
         }
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
+            async with _digest_http_client(http_client) as client:
                 timer = HttpxTimer()
                 response = await client.post(url, json=payload)
             log_httpx_response(response, timer.elapsed(), log_error=False)
@@ -691,6 +844,7 @@ async def _send_user_digest(
                     now_ts,
                     sent_alert_ids=set(),
                     filter_reasons=filter_reasons_by_alert_id,
+                    delivery_rows=delivery_rows,
                 )
                 _log_digest_metrics(config.user_id, metrics, filter_reason_events)
                 return {"user_id": str(config.user_id), "sent": True, "reason": "no_selected_alerts"}
@@ -705,10 +859,26 @@ async def _send_user_digest(
             sent_alert_ids=set(),
             skip_reason="no_selected_alerts",
             filter_reasons=filter_reasons_by_alert_id,
+            delivery_rows=delivery_rows,
         )
         _log_digest_metrics(config.user_id, metrics, filter_reason_events)
         return {"user_id": str(config.user_id), "sent": False, "reason": "no_selected_alerts"}
 
+    if not _claim_digest_fingerprint(config.user_id, window_minutes, selected_alerts):
+        _record_alert_deliveries(
+            db,
+            filtered_for_delivery,
+            included_for_delivery,
+            config.user_id,
+            now_ts,
+            sent_alert_ids=set(),
+            skip_reason="digest_dedupe",
+            filter_reasons=filter_reasons_by_alert_id,
+            delivery_rows=delivery_rows,
+        )
+        _log_digest_metrics(config.user_id, metrics, filter_reason_events)
+        return {"user_id": str(config.user_id), "sent": False, "reason": "digest_dedupe"}
+
     counts = {"REPRICING": 0, "LIQUIDITY_SWEEP": 0, "NOISY": 0}
     for alert in selected_alerts:
         classification = classifier(alert)
@@ -735,6 +905,7 @@ async def _send_user_digest(
         plan_name=config.plan_name,
     )
     if not text:
+        _release_digest_fingerprint(config.user_id, window_minutes, selected_alerts)
         _record_alert_deliveries(
             db,
             filtered_for_delivery,
@@ -744,6 +915,7 @@ async def _send_user_digest(
             sent_alert_ids=set(),
             skip_reason="empty_message",
             filter_reasons=filter_reasons_by_alert_id,
+            delivery_rows=delivery_rows,
         )
         _log_digest_metrics(config.user_id, metrics, filter_reason_events)
         return {"user_id": str(config.user_id), "sent": False, "reason": "empty_message"}
@@ -754,20 +926,6 @@ async def _send_user_digest(
     if fast_section:
         text = _append_fast_section(text, fast_section)
 
-    if not _claim_digest_fingerprint(config.user_id, window_minutes, selected_alerts):
-        _record_alert_deliveries(
-            db,
-            filtered_for_delivery,
-            included_for_delivery,
-            config.user_id,
-            now_ts,
-            sent_alert_ids=set(),
-            skip_reason="digest_dedupe",
-            filter_reasons=filter_reasons_by_alert_id,
-        )
-        _log_digest_metrics(config.user_id, metrics, filter_reason_events)
-        return {"user_id": str(config.user_id), "sent": False, "reason": "digest_dedupe"}
-
     url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": config.telegram_chat_id,
@@ -776,7 +934,7 @@ async def _send_user_digest(
         "disable_web_page_preview": True,
     }
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
+        async with _digest_http_client(http_client) as client:
             timer = HttpxTimer()
             response = await client.post(url, json=payload)
         log_httpx_response(response, timer.elapsed(), log_error=False)
@@ -791,6 +949,7 @@ async def _send_user_digest(
                 now_ts,
                 sent_alert_ids=sent_alert_ids,
                 filter_reasons=filter_reasons_by_alert_id,
+                delivery_rows=delivery_rows,
             )
             metrics["delivered_count"] = len(sent_alert_ids)
             _log_digest_metrics(config.user_id, metrics, filter_reason_events)
@@ -817,6 +976,7 @@ async def _send_user_digest(
             sent_alert_ids=set(),
             skip_reason="telegram_failed",
             filter_reasons=filter_reasons_by_alert_id,
+            delivery_rows=delivery_rows,
         )
         _log_digest_metrics(config.user_id, metrics, filter_reason_events)
         return {
@@ -836,14 +996,24 @@ async def _send_user_digest(
             sent_alert_ids=set(),
             skip_reason="telegram_exception",
             filter_reasons=filter_reasons_by_alert_id,
+            delivery_rows=delivery_rows,
         )
         _log_digest_metrics(config.user_id, metrics, filter_reason_events)
         return {"user_id": str(config.user_id), "sent": False, "status_code": 0, "text": ""}
 
 
+def _classification_key(alert: Alert) -> int:
+    return alert.id if alert.id is not None else id(alert)
+
+
+def _alert_filter_values(alert: Alert) -> tuple[float, float, float, str]:
+    return alert.liquidity, alert.volume_24h, _alert_abs_move(alert), alert.strength
+
+
 def _filter_alerts_for_user(
     alerts: list[Alert],
     config: UserDigestConfig,
+    filter_values: dict[int, tuple[float, float, float, str]] | None = None,
 ) -> tuple[list[Alert], list[Alert], dict[int, list[str]], list[str]]:
     included: list[Alert] = []
     filtered: list[Alert] = []
@@ -851,7 +1021,9 @@ def _filter_alerts_for_user(
     reason_events: list[str] = []
 
     for alert in alerts:
-        if alert.liquidity < config.min_liquidity:
+        values = filter_values.get(id(alert)) if filter_values else None
+        liquidity, volume_24h, abs_move, strength = values or _alert_filter_values(alert)
+        if liquidity < config.min_liquidity:
             filtered.append(alert)
             _note_filter_reason(
                 alert,
@@ -860,7 +1032,7 @@ def _filter_alerts_for_user(
                 reason_events,
             )
             continue
-        if alert.volume_24h < config.min_volume_24h:
+        if volume_24h < config.min_volume_24h:
             filtered.append(alert)
             _note_filter_reason(
                 alert,
@@ -869,7 +1041,7 @@ def _filter_alerts_for_user(
                 reason_events,
             )
             continue
-        if _alert_abs_move(alert) < config.min_abs_price_move:
+        if abs_move < config.min_abs_price_move:
             filtered.append(alert)
             _note_filter_reason(
                 alert,
@@ -878,7 +1050,7 @@ def _filter_alerts_for_user(
                 reason_events,
             )
             continue
-        if alert.strength not in config.alert_strengths:
+        if strength not in config.alert_strengths:
             filtered.append(alert)
             _note_filter_reason(
                 alert,
@@ -900,10 +1072,18 @@ def _alert_abs_move(alert: Alert) -> float:
     return abs(alert.move or 0.0)
 
 
-def _digest_recently_sent(user_id: UUID, now_ts: datetime, window_minutes: int) -> bool:
+def _digest_recently_sent(
+    user_id: UUID,
+    now_ts: datetime,
+    window_minutes: int,
+    last_sent: dict[str, bytes | None] | None = None,
+) -> bool:
     key = USER_DIGEST_LAST_SENT_KEY.format(user_id=user_id)
     try:
-        last_sent_raw = redis_conn.get(key)
+        if last_sent is not None and key in last_sent:
+            last_sent_raw = last_sent[key]
+        else:
+            last_sent_raw = redis_conn.get(key)
         if not last_sent_raw:
             return False
         last_sent = datetime.fromisoformat(last_sent_raw.decode())
@@ -931,6 +1111,21 @@ def _claim_digest_fingerprint(
         return True
 
 
+def _release_digest_fingerprint(
+    user_id: UUID,
+    window_minutes: int,
+    alerts: list[Alert],
+) -> None:
+    fingerprint_hash = _digest_fingerprint_hash(window_minutes, alerts)
+    if not fingerprint_hash:
+        return
+    key = DIGEST_SENT_FINGERPRINT_KEY.format(user_id=user_id, fingerprint_hash=fingerprint_hash)
+    try:
+        redis_conn.delete(key)
+    except Exception:
+        logger.exception("digest_fingerprint_release_failed user_id=%s", user_id)
+
+
 def _digest_fingerprint_hash(window_minutes: int, alerts: list[Alert]) -> str:
     if not alerts:
         return ""
@@ -939,7 +1134,7 @@ def _digest_fingerprint_hash(window_minutes: int, alerts: list[Alert]) -> str:
         theme_key = _theme_key(alert)
         themes.setdefault(theme_key, []).append(alert)
 
-    theme_items: list[dict[str, str]] = []
+    theme_items: list[tuple[str, str, str]] = []
     for theme_key, theme_alerts in themes.items():
         rep = max(
             theme_alerts,
@@ -949,21 +1144,12 @@ def _digest_fingerprint_hash(window_minutes: int, alerts: list[Alert]) -> str:
                 item.market_id or "",
             ),
         )
-        theme_items.append(
-            {
-                "theme_key": theme_key,
-                "market_id": rep.market_id or "",
-                "bucket": _digest_bucket_value(rep),
-            }
-        )
+        theme_items.append((theme_key, rep.market_id or "", _digest_bucket_value(rep)))
 
-    theme_items.sort(key=lambda item: item["theme_key"])
-    payload = {
-        "window_minutes": int(window_minutes),
-        "themes": theme_items,
-    }
-    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=True)
-    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    digest = hashlib.sha256(str(int(window_minutes)).encode("utf-8"))
+    for theme_key, market_id, bucket in sorted(theme_items):
+        digest.update(f"\x1e{theme_key}\x1f{market_id}\x1f{bucket}".encode("utf-8"))
+    return digest.hexdigest()[:16]
 
 
 def _digest_bucket_value(alert: Alert) -> str:
@@ -992,18 +1178,29 @@ def _record_digest_sent(
     last_sent_key = USER_DIGEST_LAST_SENT_KEY.format(user_id=user_id)
     last_payload_key = USER_DIGEST_LAST_PAYLOAD_KEY.format(user_id=user_id)
     tenant_payload_key = TENANT_DIGEST_LAST_PAYLOAD_KEY.format(tenant_id=tenant_id)
+    payload_json = json.dumps(payload, ensure_ascii=True)
     try:
-        redis_conn.set(last_sent_key, sent_at.isoformat())
-        redis_conn.set(last_payload_key, json.dumps(payload, ensure_ascii=True))
-        redis_conn.set(tenant_payload_key, json.dumps(payload, ensure_ascii=True))
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.set(last_sent_key, sent_at.isoformat())
+        pipe.set(last_payload_key, payload_json)
+        pipe.set(tenant_payload_key, payload_json)
+        pipe.execute()
     except Exception:
         logger.exception("digest_state_write_failed user_id=%s", user_id)
 
 
-def _fast_digest_recently_sent(user_id: UUID, now_ts: datetime, window_minutes: int) -> bool:
+def _fast_digest_recently_sent(
+    user_id: UUID,
+    now_ts: datetime,
+    window_minutes: int,
+    last_sent: dict[str, bytes | None] | None = None,
+) -> bool:
     key = USER_FAST_DIGEST_LAST_SENT_KEY.format(user_id=user_id)
     try:
-        last_sent_raw = redis_conn.get(key)
+        if last_sent is not None and key in last_sent:
+            last_sent_raw = last_sent[key]
+        else:
+            last_sent_raw = redis_conn.get(key)
         if not last_sent_raw:
             return False
         last_sent = datetime.fromisoformat(last_sent_raw.decode())
@@ -1050,6 +1247,7 @@ def _record_alert_deliveries(
     sent_alert_ids: set[int],
     skip_reason: str | None = None,
     filter_reasons: dict[int, list[str]] | None = None,
+    delivery_rows: dict[tuple[int, UUID], dict] | None = None,
 ) -> None:
     # Use dict keyed by alert_id to deduplicate - later entries win
     # This prevents CardinalityViolation when same alert appears in both lists
@@ -1093,19 +1291,35 @@ def _record_alert_deliveries(
     if skip_reason:
         logger.debug("digest_delivery_skipped user_id=%s reason=%s", user_id, skip_reason)
 
-    stmt = pg_insert(AlertDelivery).values(rows)
-    update_set = {
-        "delivered_at": delivered_at,
-        "delivery_status": stmt.excluded.delivery_status,
-        "filter_reasons": stmt.excluded.filter_reasons,
-    }
-    if include_expires_at:
-        update_set["expires_at"] = expires_at
-    stmt = stmt.on_conflict_do_update(
-        index_elements=["alert_id", "user_id"],
-        set_=update_set,
-    )
-    db.execute(stmt)
+    if delivery_rows is not None:
+        for row in rows:
+            delivery_rows[(row["alert_id"], user_id)] = row
+        return
+    _upsert_alert_deliveries(db, rows)
+
+
+def _flush_alert_deliveries(db: Session, delivery_rows: dict[tuple[int, UUID], dict]) -> None:
+    _upsert_alert_deliveries(db, list(delivery_rows.values()))
+    delivery_rows.clear()
+
+
+def _upsert_alert_deliveries(db: Session, rows: list[dict]) -> None:
+    if not rows:
+        return
+    for start in range(0, len(rows), ALERT_DELIVERY_UPSERT_BATCH):
+        stmt = pg_insert(AlertDelivery).values(rows[start : start + ALERT_DELIVERY_UPSERT_BATCH])
+        update_set = {
+            "delivered_at": stmt.excluded.delivered_at,
+            "delivery_status": stmt.excluded.delivery_status,
+            "filter_reasons": stmt.excluded.filter_reasons,
+        }
+        if "expires_at" in rows[0]:
+            update_set["expires_at"] = stmt.excluded.expires_at
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["alert_id", "user_id"],
+            set_=update_set,
+        )
+        db.execute(stmt)
     db.commit()
 
 
@@ -1133,24 +1347,21 @@ def _prepare_fast_digest(
     config: UserDigestConfig,
     now_ts: datetime,
     include_footer: bool,
+    preloaded_alerts: list[Alert] | None = None,
+    last_sent: dict[str, bytes | None] | None = None,
 ) -> tuple[FastDigestPayload | None, str | None]:
     if not settings.FAST_SIGNALS_GLOBAL_ENABLED or not config.fast_signals_enabled:
         return None, "fast_disabled"
 
     window_minutes = max(config.fast_window_minutes, 1)
-    if _fast_digest_recently_sent(config.user_id, now_ts, window_minutes):
+    if _fast_digest_recently_sent(config.user_id, now_ts, window_minutes, last_sent=last_sent):
         return None, "recent_fast_digest"
 
     window_start = now_ts - timedelta(minutes=window_minutes)
-    rows = (
-        db.query(Alert)
-        .filter(
-            Alert.tenant_id == tenant_id,
-            Alert.alert_type == FAST_ALERT_TYPE,
-            Alert.created_at >= window_start,
-        )
-        .all()
-    )
+    if preloaded_alerts is not None:
+        rows = _alerts_created_since(preloaded_alerts, window_start)
+    else:
+        rows = _fast_alert_query(db, tenant_id, window_start).all()
     if not rows:
         return None, "no_fast_alerts"
 
@@ -1193,6 +1404,7 @@ async def _send_user_fast_digest(
     config: UserDigestConfig,
     payload: FastDigestPayload,
     now_ts: datetime,
+    http_client: httpx.AsyncClient | None = None,
 ) -> dict:
     if not config.telegram_chat_id:
         return {"user_id": str(config.user_id), "sent": False, "reason": "missing_chat_id"}
@@ -1208,7 +1420,7 @@ async def _send_user_fast_digest(
         "disable_web_page_preview": True,
     }
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
+        async with _digest_http_client(http_client) as client:
             timer = HttpxTimer()
             response = await client.post(url, json=send_payload)
         log_httpx_response(response, timer.elapsed(), log_error=False)
@@ -1238,16 +1450,18 @@ async def _send_user_fast_digest(
         return {"user_id": str(config.user_id), "sent": False, "status_code": 0, "text": ""}
 
 
-def _rank_alerts(alerts: list[Alert]) -> list[Alert]:
-    return sorted(
-        alerts,
-        key=lambda alert: (
-            abs(alert.new_price - alert.old_price),
-            alert.liquidity,
-            alert.volume_24h,
-        ),
-        reverse=True,
-    )
+def _rank_alerts(
+    alerts: list[Alert],
+    filter_values: dict[int, tuple[float, float, float, str]] | None = None,
+) -> list[Alert]:
+    def rank_key(alert: Alert) -> tuple[float, float, float]:
+        values = filter_values.get(id(alert)) if filter_values else None
+        if values is None:
+            return abs(alert.new_price - alert.old_price), alert.liquidity, alert.volume_24h
+        liquidity, volume_24h, abs_move, _ = values
+        return abs_move, liquidity, volume_24h
+
+    return sorted(alerts, key=rank_key, reverse=True)
 
 
 def _score_copilot_theme(theme: Theme) -> float:
@@ -1344,12 +1558,6 @@ def _format_digest_message(
     if not alerts:
         return ""
 
-    actionable_included = 0
-    for alert in alerts:
-        classification = classifier(alert) if classifier else classify_alert(alert)
-        if _is_actionable_classification(classification):
-            actionable_included += 1
-
     if defaults.THEME_GROUPING_ENABLED:
         return _format_grouped_digest_message(
             alerts,
@@ -1362,13 +1570,16 @@ def _format_digest_message(
             plan_name=plan_name,
         )
 
+    classifications = [classifier(alert) if classifier else classify_alert(alert) for alert in alerts]
+    actionable_included = sum(
+        1 for classification in classifications if _is_actionable_classification(classification)
+    )
     header_label = f"{actionable_included} actionable repricings" if actionable_included else f"{len(alerts)} signals"
     header = f"<b>PMD - {header_label} ({window_minutes}m)</b>"
     lines = [header, ""]
 
     actionable_displayed = 0
-    for idx, alert in enumerate(alerts, start=1):
-        classification = classifier(alert) if classifier else classify_alert(alert)
+    for idx, (alert, classification) in enumerate(zip(alerts, classifications), start=1):
         if _is_actionable_classification(classification):
             actionable_displayed += 1
         watchlist_label = _watchlist_label(plan_name, classification)
@@ -1903,16 +2114,17 @@ def _get_probability_for_band(alert: Alert) -> float | None:
     if not treat_yesno and is_yesno is False:
         label = _sanitize_outcome_label(getattr(alert, "primary_outcome_label", None))
         if label:
+            lowered = label.lower()
             for attr in (
-                f"market_p_{label.lower()}",
+                f"market_p_{lowered}",
                 f"market_p_{label}",
-                f"p_{label.lower()}",
+                f"p_{lowered}",
                 f"p_{label}",
             ):
                 prob = getattr(alert, attr, None)
                 if prob is not None:
                     return prob
-    if getattr(alert, "is_yesno", None) is False and not treat_yesno:
+    if is_yesno is False and not treat_yesno:
         for attr in ("market_p_primary", "p_primary"):
             prob = getattr(alert, attr, None)
             if prob is not None:
@@ -2184,7 +2396,7 @@ def _copilot_daily_count_key(user_id: UUID, now_ts: datetime, signal_speed: str
 
 
 def _copilot_hourly_count_key(user_id: UUID, now_ts: datetime) -> str:
-    hour_key = now_ts.strftime("%Y-%m-%d-%H")
+    hour_key = f"{now_ts.year:04d}-{now_ts.month:02d}-{now_ts.day:02d}-{now_ts.hour:02d}"
     return COPILOT_HOURLY_COUNT_KEY.format(user_id=user_id, hour=hour_key)
 
 
@@ -2403,24 +2615,12 @@ def _enqueue_ai_recommendations(
         now_ts,
     )
 
-    muted_market_ids = {
-        row.market_id
-        for row in db.query(AiMarketMute)
-        .filter(
-            AiMarketMute.user_id == config.user_id,
-            AiMarketMute.expires_at > now_ts,
-        )
-        .all()
-    }
-    muted_theme_keys = {
-        row.theme_key
-        for row in db.query(AiThemeMute)
-        .filter(
-            AiThemeMute.user_id == config.user_id,
-            AiThemeMute.expires_at > now_ts,
-        )
-        .all()
-    }
+    muted_pairs = bulk_is_muted(
+        db,
+        config.user_id,
+        [(theme.representative.market_id, theme.key) for theme in themes],
+        now_ts,
+    )
 
     eligible_themes: list[Theme] = []
     evaluations: list[CopilotThemeEvaluation] = []
@@ -2445,7 +2645,7 @@ def _enqueue_ai_recommendations(
                 base_reasons.append(CopilotIneligibilityReason.USER_DISABLED.value)
             if not config.copilot_plan_enabled:
                 base_reasons.append(CopilotIneligibilityReason.PLAN_DISABLED.value)
-        if theme.key in muted_theme_keys or rep.market_id in muted_market_ids:
+        if muted_pairs.get((rep.market_id, theme.key)):
             base_reasons.append(CopilotIneligibilityReason.MUTED.value)
         if rep_classification.signal_type != "REPRICING" and not fast_mode:
             base_reasons.append(CopilotIneligibilityReason.NOT_REPRICING.value)
@@ -2835,10 +3035,11 @@ def _emit_copilot_run_summary(
     telegram_sends_attempted: int,
     telegram_sends_succeeded: int,
     eligible_drop_reasons_counts: dict[str, int] | None = None,
+    now_ts: datetime | None = None,
 ) -> dict[str, object]:
     summary = _build_copilot_run_summary(
         config=config,
-        now_ts=datetime.now(timezone.utc),
+        now_ts=now_ts or datetime.now(timezone.utc),
         digest_window_minutes=digest_window_minutes,
         run_id=run_id,
         themes_total=themes_total,
@@ -2935,6 +3136,7 @@ def _record_copilot_run(
         eligible_drop_reasons_counts=summary["eligible_drop_reasons_counts"]
         if isinstance(summary.get("eligible_drop_reasons_counts"), dict)
         else {},
+        now_ts=now_ts,
     )
 
 
@@ -2985,26 +3187,33 @@ def _theme_key(alert: Alert) -> str:
 
 def group_alerts_into_themes(alerts: list[Alert], classifier=None) -> list[Theme]:
     themes: list[Theme] = []
+    theme_index_by_key: dict[str, int] = {}
+    theme_indexes_by_token: dict[str, list[int]] = {}
     for alert in alerts:
         title = alert.title or ""
         extracted = extract_theme(title, category=alert.category, slug=alert.market_id)
         theme_key = extracted.theme_key
         token_list = strip_stopwords(normalize_text(title).split())
         tokens = set(token_list)
-        matched = None
-        for theme in themes:
-            if theme.key == theme_key:
-                matched = theme
-                break
-        if matched is None:
-            for theme in themes:
-                if _jaccard_similarity(theme.tokens, tokens) >= 0.6:
-                    matched = theme
+        matched_index = theme_index_by_key.get(theme_key)
+        if matched_index is None:
+            candidate_indexes = {
+                index for token in tokens for index in theme_indexes_by_token.get(token, ())
+            }
+            for index in sorted(candidate_indexes):
+                if _jaccard_similarity(themes[index].tokens, tokens) >= 0.6:
+                    matched_index = index
                     break
-        if matched:
+        if matched_index is not None:
+            matched = themes[matched_index]
             matched.alerts.append(alert)
+            for token in tokens - matched.tokens:
+                theme_indexes_by_token.setdefault(token, []).append(matched_index)
             matched.tokens |= tokens
         else:
+            theme_index_by_key[theme_key] = len(themes)
+            for token in tokens:
+                theme_indexes_by_token.setdefault(token, []).append(len(themes))
             label = extracted.theme_label
             themes.append(
                 Theme(
@@ -3058,9 +3267,9 @@ def _short_title(alert: Alert, theme_hint: bool = False) -> str:
     if theme_hint:
         return extract_theme(title, category=alert.category, slug=alert.market_id).short_title
 
-    cleaned = re.sub(r"^\s*will\s+", "", title, flags=re.IGNORECASE)
-    cleaned = re.sub(r"^\s*the\s+price\s+of\s+", "", cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r"\s+on\s+.*$", "", cleaned, flags=re.IGNORECASE)
+    cleaned = _SHORT_TITLE_WILL_RE.sub("", title)
+    cleaned = _SHORT_TITLE_PRICE_OF_RE.sub("", cleaned)
+    cleaned = _SHORT_TITLE_ON_TAIL_RE.sub("", cleaned)
     cleaned = cleaned.replace("?", "").strip()
     return cleaned[:80] or title[:80]
 
@@ -3084,14 +3293,25 @@ def _format_p_yes_compact(alert: Alert) -> str:
 
 
 def _format_probability_label(alert: Alert) -> str:
-    market_kind = getattr(alert, "market_kind", None)
-    is_yesno = getattr(alert, "is_yesno", None)
+    return _probability_label(
+        getattr(alert, "market_kind", None),
+        getattr(alert, "is_yesno", None),
+        getattr(alert, "mapping_confidence", None),
+        getattr(alert, "primary_outcome_label", None),
+    )
+
+
+@lru_cache(maxsize=1024)
+def _probability_label(
+    market_kind: str | None,
+    is_yesno: bool | None,
+    mapping_confidence: str | None,
+    label: str | None,
+) -> str:
     if market_kind == "yesno" or is_yesno is True:
         return "p_yes"
-    mapping_confidence = getattr(alert, "mapping_confidence", None)
     if mapping_confidence != "verified":
         return "p_outcome0"
-    label = getattr(alert, "primary_outcome_label", None)
     sanitized = _sanitize_outcome_label(label)
     if not sanitized:
         return "p_outcome0"
@@ -3100,10 +3320,11 @@ def _format_probability_label(alert: Alert) -> str:
     return f"p_{sanitized}"
 
 
+@lru_cache(maxsize=1024)
 def _sanitize_outcome_label(label: str | None) -> str | None:
     if not label:
         return None
-    cleaned = re.sub(r"[^A-Za-z0-9]+", "_", str(label).strip()).strip("_")
+    cleaned = _OUTCOME_LABEL_SEPARATOR_RE.sub("_", str(label).strip()).strip("_")
     if not cleaned:
         return None
     cleaned = cleaned.upper()
@@ -3115,7 +3336,7 @@ def _sanitize_outcome_label(label: str | None) -> str | None:
 def _extract_theme_metadata(title: str) -> dict:
     text = title.lower()
     date = _extract_date(text)
-    range_match = re.search(r"between\s+\$?([\d,]+(?:\.\d+)?)\s+and\s+\$?([\d,]+(?:\.\d+)?)", text)
+    range_match = _PRICE_RANGE_RE.search(text)
     if range_match:
         return {
             "kind": "range",
@@ -3124,7 +3345,7 @@ def _extract_theme_metadata(title: str) -> dict:
             "range_low": _parse_number(range_match.group(1)),
             "range_high": _parse_number(range_match.group(2)),
         }
-    above_below = re.search(r"\b(above|below)\s+\$?([\d,]+(?:\.\d+)?)", text)
+    above_below = _ABOVE_BELOW_RE.search(text)
     if above_below:
         return {
             "kind": above_below.group(1),
@@ -3171,11 +3392,11 @@ def _theme_label(meta: dict, title: str) -> str:
 
 
 def _normalize_key(value: str) -> str:
-    return re.sub(r"\s+", "-", value.strip())
+    return _WHITESPACE_RUN_RE.sub("-", value.strip())
 
 
 def _extract_underlying(text: str) -> str | None:
-    tokens = re.findall(r"[a-z0-9]+", text)
+    tokens = _ALNUM_TOKEN_RE.findall(text)
     if "price" in tokens and "of" in tokens:
         try:
             idx = tokens.index("of") + 1
@@ -3232,21 +3453,17 @@ def _copilot_skip_note(config: UserDigestConfig, result: CopilotEnqueueResult |
 
 
 def _extract_matchup(text: str) -> str | None:
-    match = re.search(r"\b([a-z0-9]+)\s+(?:vs|v)\s+([a-z0-9]+)\b", text)
+    match = _MATCHUP_RE.search(text)
     if match:
         return f"{match.group(1)}_{match.group(2)}"
     return None
 
 
 def _extract_date(text: str) -> str | None:
-    iso_match = re.search(r"\b\d{4}-\d{2}-\d{2}\b", text)
+    iso_match = _ISO_DATE_RE.search(text)
     if iso_match:
         return iso_match.group(0)
-    month_match = re.search(
-        r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|"
-        r"jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s+(\d{1,2})\b",
-        text,
-    )
+    month_match = _MONTH_DAY_RE.search(text)
     if not month_match:
         return None
     month = _MONTHS.get(month_match.group(1)[:3], month_match.group(1))
@@ -3262,7 +3479,7 @@ def _parse_number(raw: str) -> float:
 
 
 def _significant_tokens(title: str) -> list[str]:
-    tokens = re.findall(r"[a-z0-9]+", title.lower())
+    tokens = _ALNUM_TOKEN_RE.findall(title.lower())
     return [token for token in tokens if token not in _STOPWORDS]
 
 
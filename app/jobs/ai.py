@@ -1,5 +1,6 @@
 import logging
 import uuid
+from collections import Counter
 
 from sqlalchemy.orm import Session
 
@@ -20,6 +21,7 @@ def ai_recommendation_job(
     window_minutes: int | None = None,
 ) -> dict:
     db: Session = SessionLocal()
+    run_counters: Counter = Counter()
     try:
         parsed_user_id = user_id
         if isinstance(user_id, str):
@@ -56,6 +58,8 @@ def ai_recommendation_job(
             run_id=run_id,
             signal_speed=signal_speed,
             window_minutes=window_minutes,
+            effective=effective,
+            run_counters=run_counters,
         )
         if not rec:
             return {"ok": False, "reason": "no_recommendation"}
@@ -64,5 +68,5 @@ def ai_recommendation_job(
         logger.exception("ai_recommendation_job_failed user_id=%s alert_id=%s", user_id, alert_id)
         return {"ok": False, "reason": "exception"}
     finally:
-        _complete_copilot_run(run_id)
+        _complete_copilot_run(run_id, run_counters)
         db.close()
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import logging
 import time
@@ -14,7 +15,7 @@ from ..http_logging import HttpxTimer, log_httpx_response
 logger = logging.getLogger(__name__)
 redis_conn = redis.from_url(settings.REDIS_URL)
 
-LLM_CACHE_KEY = "ai:llm:{user_id}:{alert_id}"
+LLM_CACHE_KEY = "ai:llm:alert:{alert_id}:{signal_speed}:{window_minutes}:{evidence_hash}"
 
 
 class LlmRecommendation(BaseModel):
@@ -28,8 +29,13 @@ def get_trade_recommendation(context: dict[str, Any]) -> dict[str, str]:
     user_id = context.get("user_id")
     alert_id = context.get("alert_id")
     cache_key = None
-    if user_id and alert_id:
-        cache_key = LLM_CACHE_KEY.format(user_id=user_id, alert_id=alert_id)
+    if alert_id:
+        cache_key = LLM_CACHE_KEY.format(
+            alert_id=alert_id,
+            signal_speed=context.get("signal_speed") or "",
+            window_minutes=context.get("window_minutes") or "",
+            evidence_hash=_evidence_hash(context.get("evidence")),
+        )
         cached = _get_cached(cache_key)
         if cached:
             return cached
@@ -44,7 +50,6 @@ def get_trade_recommendation(context: dict[str, Any]) -> dict[str, str]:
             "rationale": "LLM unavailable; defaulting to WAIT.",
             "risks": "Recommendation unavailable due to missing API key.",
         }
-        _set_cached(cache_key, fallback)
         return fallback
 
     if not LLM_BREAKER.allow():
@@ -55,7 +60,6 @@ def get_trade_recommendation(context: dict[str, Any]) -> dict[str, str]:
             "rationale": "LLM unavailable; defaulting to WAIT.",
             "risks": "Recommendation unavailable due to recent failures.",
         }
-        _set_cached(cache_key, fallback)
         return fallback
 
     headers = {"Authorization": f"Bearer {api_key}"}
@@ -91,14 +95,22 @@ def get_trade_recommendation(context: dict[str, Any]) -> dict[str, str]:
             "rationale": "LLM unavailable; defaulting to WAIT.",
             "risks": "Recommendation unavailable due to request failure.",
         }
-        _set_cached(cache_key, fallback)
         return fallback
 
-    parsed = _parse_openai_response(response_data)
+    parsed = _parse_llm_recommendation(response_data)
+    if parsed is None:
+        return _invalid_response_fallback()
     _set_cached(cache_key, parsed)
     return parsed
 
 
+def _evidence_hash(evidence: Any) -> str:
+    if not evidence:
+        return ""
+    text = "\n".join(str(line) for line in evidence)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
 def _llm_timeout() -> httpx.Timeout:
     return httpx.Timeout(
         settings.LLM_TIMEOUT_SECONDS,
@@ -140,18 +152,26 @@ def _build_openai_payload(context: dict[str, Any]) -> dict[str, Any]:
 
 
 def _parse_openai_response(payload: dict[str, Any]) -> dict[str, str]:
+    return _parse_llm_recommendation(payload) or _invalid_response_fallback()
+
+
+def _invalid_response_fallback() -> dict[str, str]:
+    return {
+        "recommendation": "WAIT",
+        "confidence": "LOW",
+        "rationale": "LLM response invalid; defaulting to WAIT.",
+        "risks": "Invalid LLM response payload.",
+    }
+
+
+def _parse_llm_recommendation(payload: dict[str, Any]) -> dict[str, str] | None:
     try:
         content = payload["choices"][0]["message"]["content"]
         raw = json.loads(content)
         parsed = LlmRecommendation.model_validate(raw)
     except (KeyError, IndexError, json.JSONDecodeError, ValidationError):
         logger.exception("llm_response_parse_failed")
-        return {
-            "recommendation": "WAIT",
-            "confidence": "LOW",
-            "rationale": "LLM response invalid; defaulting to WAIT.",
-            "risks": "Invalid LLM response payload.",
-        }
+        return None
 
     recommendation = parsed.recommendation.strip().upper()
     confidence = parsed.confidence.strip().upper()
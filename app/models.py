@@ -40,6 +40,13 @@ class MarketSnapshot(Base):
         ),
         Index("ix_market_snapshots_bucket", "snapshot_bucket"),
         Index("ix_market_snapshots_market_asof", "market_id", "asof_ts"),
+        Index(
+            "ix_market_snapshots_market_bucket_cover",
+            "market_id",
+            "snapshot_bucket",
+            postgresql_include=["market_p_yes"],
+            postgresql_where=text("market_p_yes IS NOT NULL"),
+        ),
         Index("ix_market_snapshots_asof_desc", text("asof_ts DESC")),
         Index("ix_market_snapshots_expires_at", "expires_at"),
     )
@@ -119,7 +126,12 @@ class Alert(Base):
         ),
         Index("ix_alerts_created_at", "created_at"),
         Index("ix_alerts_expires_at", "expires_at"),
-        Index("ix_alerts_tenant_type", "tenant_id", "alert_type"),
+        Index(
+            "ix_alerts_tenant_type_created_desc",
+            "tenant_id",
+            "alert_type",
+            text("created_at DESC"),
+        ),
         Index(
             "ix_alerts_tenant_created_desc",
             "tenant_id",
@@ -582,6 +594,12 @@ class AiRecommendation(Base):
             text("id DESC"),
         ),
         Index("ix_ai_recommendations_created_at", "created_at"),
+        Index(
+            "ix_ai_recommendations_user_alert_created_desc",
+            "user_id",
+            "alert_id",
+            text("created_at DESC"),
+        ),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -3,7 +3,7 @@ import json
 import uuid
 from datetime import datetime, timedelta, timezone
 
-from app.core.alert_classification import classify_alert_with_snapshots
+from app.core.alert_classification import classify_alert_with_snapshots, classify_alerts_with_snapshots
 from app.core.alerts import (
     AlertClass,
     _copilot_skip_note,
@@ -69,7 +69,12 @@ def main() -> None:
             alerts, config
         )
 
-        classification_cache = {}
+        classification_cache = dict(
+            zip(
+                (alert.id for alert in included_alerts),
+                classify_alerts_with_snapshots(db, included_alerts),
+            )
+        )
 
         def classifier(alert):
             cached = classification_cache.get(alert.id)
@@ -82,6 +82,9 @@ EXPECTED_INDEXES = {
     "ix_market_snapshots_expires_at",
     "ix_alerts_expires_at",
     "ix_alert_deliveries_expires_at",
+    "ix_market_snapshots_market_bucket_cover",
+    "ix_ai_recommendations_user_alert_created_desc",
+    "ix_alerts_tenant_type_created_desc",
 }
 
 
@@ -221,6 +224,15 @@ def _run_explain(conn) -> None:
                 "ORDER BY snapshot_bucket ASC"
             )
         ).fetchall(),
+        "price_points_before": conn.execute(
+            text(
+                "EXPLAIN (ANALYZE, COSTS, BUFFERS, FORMAT TEXT) "
+                "SELECT snapshot_bucket, market_p_yes FROM market_snapshots "
+                "WHERE market_id = 'mkt_test_1' AND market_p_yes IS NOT NULL "
+                "AND snapshot_bucket <= now() "
+                "ORDER BY snapshot_bucket DESC LIMIT 6"
+            )
+        ).fetchall(),
         "copilot_recommendations": conn.execute(
             text(
                 "EXPLAIN (ANALYZE, COSTS, BUFFERS, FORMAT TEXT) "
@@ -1,5 +1,5 @@
 import asyncio
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
 from uuid import uuid4
 
@@ -13,13 +13,17 @@ from app.core.alerts import (
     CopilotThemeEvaluation,
     FilterReason,
     UserDigestConfig,
+    _alert_filter_values,
+    _filter_alerts_for_user,
     _is_within_actionable_pyes,
     _normalize_allowed_strengths,
+    _rank_alerts,
     _send_user_digest,
 )
 from app.core.effective_settings import _parse_strengths
 from app.db import Base
 from app.models import Alert, AlertDelivery
+from app.core import alerts as alerts_module
 from app.core import defaults
 
 
@@ -108,6 +112,14 @@ def _patch_digest_helpers(monkeypatch):
     monkeypatch.setattr("app.core.alerts._enqueue_ai_recommendations", lambda *args, **kwargs: None)
 
 
+def _patch_classifier(monkeypatch, classify):
+    monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", classify)
+    monkeypatch.setattr(
+        "app.core.alerts.classify_alerts_with_snapshots",
+        lambda db, alerts: [classify(db, alert) for alert in alerts],
+    )
+
+
 def _install_fake_telegram(monkeypatch, payloads):
     class _FakeResponse:
         is_success = True
@@ -174,7 +186,7 @@ def test_wait_alerts_do_not_trigger_digest(db_session, monkeypatch):
     def _fake_classify(_, alert_arg):
         return AlertClassification("LIQUIDITY_SWEEP", "MEDIUM", "WAIT")
 
-    monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+    _patch_classifier(monkeypatch, _fake_classify)
     payloads = []
     _install_fake_telegram(monkeypatch, payloads)
 
@@ -195,7 +207,7 @@ def test_pyes_bounds_filter_excludes_alerts(db_session, monkeypatch):
     def _fake_classify(_, alert_arg):
         return AlertClassification("REPRICING", "MEDIUM", "FOLLOW")
 
-    monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+    _patch_classifier(monkeypatch, _fake_classify)
 
     payloads = []
     _install_fake_telegram(monkeypatch, payloads)
@@ -220,7 +232,7 @@ def test_digest_sends_only_with_actionable_alerts(db_session, monkeypatch):
             return AlertClassification("REPRICING", "HIGH", "FOLLOW")
         return AlertClassification("LIQUIDITY_SWEEP", "MEDIUM", "WAIT")
 
-    monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+    _patch_classifier(monkeypatch, _fake_classify)
 
     payloads = []
 
@@ -250,6 +262,116 @@ def test_digest_sends_only_with_actionable_alerts(db_session, monkeypatch):
     assert payloads
 
 
+def test_preloaded_alerts_filtered_to_user_window(db_session, monkeypatch):
+    _patch_digest_helpers(monkeypatch)
+
+    recent = _make_alert(market_id="market-recent")
+    stale = _make_alert(
+        market_id="market-stale",
+        created_at=datetime.now(timezone.utc) - timedelta(minutes=90),
+    )
+    db_session.add_all([recent, stale])
+    db_session.commit()
+
+    classified = []
+
+    def _fake_classify(_, alert_arg):
+        classified.append(alert_arg.market_id)
+        return AlertClassification("REPRICING", "HIGH", "FOLLOW")
+
+    _patch_classifier(monkeypatch, _fake_classify)
+    payloads = []
+    _install_fake_telegram(monkeypatch, payloads)
+
+    config = _make_config(digest_window_minutes=60)
+    result = asyncio.run(
+        _send_user_digest(db_session, "tenant-1", config, preloaded_alerts=[recent, stale])
+    )
+    assert result["sent"] is True
+    assert classified == ["market-recent"]
+
+
+def test_shared_classification_cache_classifies_each_alert_once(db_session, monkeypatch):
+    _patch_digest_helpers(monkeypatch)
+
+    alert = _make_alert(market_id="market-shared")
+    db_session.add(alert)
+    db_session.commit()
+
+    batches = []
+
+    def _fake_batch_classify(db, alerts):
+        batches.append([alert_arg.market_id for alert_arg in alerts])
+        return [AlertClassification("REPRICING", "HIGH", "FOLLOW") for _ in alerts]
+
+    monkeypatch.setattr("app.core.alerts.classify_alerts_with_snapshots", _fake_batch_classify)
+    monkeypatch.setattr(
+        "app.core.alerts.classify_alert_with_snapshots",
+        lambda *args, **kwargs: pytest.fail("cached alert classified again"),
+    )
+    payloads = []
+    _install_fake_telegram(monkeypatch, payloads)
+
+    classification_cache = {}
+    for _ in range(2):
+        result = asyncio.run(
+            _send_user_digest(
+                db_session,
+                "tenant-1",
+                _make_config(),
+                classification_cache=classification_cache,
+            )
+        )
+        assert result["sent"] is True
+
+    assert batches == [["market-shared"], []]
+    assert len(payloads) == 2
+
+
+def test_precomputed_filter_values_match_direct_filtering():
+    alerts = [
+        _make_alert(id=1, liquidity=50.0),
+        _make_alert(id=2, volume_24h=50.0),
+        _make_alert(id=3, old_price=0.5, new_price=0.501, move=0.001, delta_pct=0.001),
+        _make_alert(id=4, strength="MEDIUM"),
+        _make_alert(id=5),
+    ]
+    config = _make_config(
+        min_liquidity=100.0,
+        min_volume_24h=100.0,
+        min_abs_price_move=0.01,
+        alert_strengths={"STRONG"},
+    )
+    filter_values = {id(alert): _alert_filter_values(alert) for alert in alerts}
+
+    direct = _filter_alerts_for_user(alerts, config)
+    precomputed = _filter_alerts_for_user(alerts, config, filter_values)
+
+    assert precomputed == direct
+    assert [alert.id for alert in precomputed[0]] == [5]
+    assert precomputed[2] == {
+        1: [FilterReason.LIQUIDITY_BELOW_MIN.value],
+        2: [FilterReason.VOLUME_BELOW_MIN.value],
+        3: [FilterReason.ABS_MOVE_BELOW_MIN.value],
+        4: [FilterReason.STRENGTH_NOT_ALLOWED.value],
+    }
+
+
+def test_rank_alerts_with_precomputed_values_matches_direct_ranking():
+    alerts = [
+        _make_alert(id=1, old_price=0.4, new_price=0.5),
+        _make_alert(id=2, old_price=0.4, new_price=0.6),
+        _make_alert(id=3, old_price=0.4, new_price=0.5, liquidity=50000.0),
+        _make_alert(id=4, old_price=0.4, new_price=0.5),
+    ]
+    filter_values = {id(alert): _alert_filter_values(alert) for alert in alerts}
+
+    direct = _rank_alerts(alerts)
+
+    assert _rank_alerts(alerts, filter_values) == direct
+    assert [alert.id for alert in direct] == [2, 3, 1, 4]
+
+
 def test_digest_caps_actionable_items(db_session, monkeypatch):
     _patch_digest_helpers(monkeypatch)
 
@@ -267,7 +389,7 @@ def test_digest_caps_actionable_items(db_session, monkeypatch):
         def _fake_classify(_, alert_arg):
             return AlertClassification("REPRICING", "HIGH", "FOLLOW")
 
-        monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+        _patch_classifier(monkeypatch, _fake_classify)
 
         payloads = []
 
@@ -311,7 +433,7 @@ def test_digest_header_format(db_session, monkeypatch):
     def _fake_classify(_, alert_arg):
         return AlertClassification("REPRICING", "HIGH", "FOLLOW")
 
-    monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+    _patch_classifier(monkeypatch, _fake_classify)
 
     payloads = []
 
@@ -352,8 +474,8 @@ def test_digest_dedupe_skips_duplicate_send(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
 
@@ -377,12 +499,69 @@ def test_digest_dedupe_skips_duplicate_send(db_session, monkeypatch):
 
     monkeypatch.setattr("app.core.alerts.httpx.AsyncClient", _FakeClient)
 
+    format_calls = []
+    original_format = alerts_module._format_digest_message
+
+    def _counting_format(*args, **kwargs):
+        format_calls.append(1)
+        return original_format(*args, **kwargs)
+
+    monkeypatch.setattr("app.core.alerts._format_digest_message", _counting_format)
+
     config = _make_config()
     first = asyncio.run(_send_user_digest(db_session, "tenant-1", config))
     second = asyncio.run(_send_user_digest(db_session, "tenant-1", config))
     assert first["sent"] is True
     assert second["sent"] is False
     assert second["reason"] == "digest_dedupe"
+    assert len(format_calls) == 1
+
+
+def test_empty_message_releases_digest_fingerprint(db_session, monkeypatch):
+    monkeypatch.setattr("app.core.alerts._digest_recently_sent", lambda *args, **kwargs: False)
+    monkeypatch.setattr("app.core.alerts._record_digest_sent", lambda *args, **kwargs: None)
+    fake_redis = FakeRedis()
+    monkeypatch.setattr("app.core.alerts.redis_conn", fake_redis)
+    monkeypatch.setattr("app.core.alerts._enqueue_ai_recommendations", lambda *args, **kwargs: None)
+
+    alert = _make_alert(market_id="market-1")
+    db_session.add(alert)
+    db_session.commit()
+
+    _patch_classifier(
+        monkeypatch,
+        lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
+    )
+
+    class _FakeResponse:
+        is_success = True
+        status_code = 200
+        text = "ok"
+
+    class _FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def post(self, url, json):
+            return _FakeResponse()
+
+    monkeypatch.setattr("app.core.alerts.httpx.AsyncClient", _FakeClient)
+    original_format = alerts_module._format_digest_message
+    monkeypatch.setattr("app.core.alerts._format_digest_message", lambda *args, **kwargs: "")
+
+    config = _make_config()
+    empty = asyncio.run(_send_user_digest(db_session, "tenant-1", config))
+    monkeypatch.setattr("app.core.alerts._format_digest_message", original_format)
+    retried = asyncio.run(_send_user_digest(db_session, "tenant-1", config))
+
+    assert empty["reason"] == "empty_message"
+    assert retried["sent"] is True
 
 
 def test_strong_alert_delivered_without_filters(db_session, monkeypatch):
@@ -396,8 +575,8 @@ def test_strong_alert_delivered_without_filters(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
 
@@ -425,8 +604,8 @@ def test_medium_filtered_when_only_strong_allowed(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
 
@@ -480,8 +659,8 @@ def test_theme_grouping_keeps_strong_delivery(db_session, monkeypatch):
     db_session.add_all([strong_alert, medium_alert])
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
 
@@ -517,8 +696,8 @@ def test_fast_repricings_skip_probability_band(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
 
@@ -547,8 +726,8 @@ def test_copilot_skip_reason_visible_on_caps(db_session, monkeypatch):
     monkeypatch.setattr("app.core.alerts._digest_recently_sent", lambda *args, **kwargs: False)
     monkeypatch.setattr("app.core.alerts._claim_digest_fingerprint", lambda *args, **kwargs: True)
     monkeypatch.setattr("app.core.alerts._record_digest_sent", lambda *args, **kwargs: None)
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
     monkeypatch.setattr(
@@ -591,8 +770,8 @@ def test_llm_error_footer_visible(db_session, monkeypatch):
     monkeypatch.setattr("app.core.alerts._digest_recently_sent", lambda *args, **kwargs: False)
     monkeypatch.setattr("app.core.alerts._claim_digest_fingerprint", lambda *args, **kwargs: True)
     monkeypatch.setattr("app.core.alerts._record_digest_sent", lambda *args, **kwargs: None)
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
     monkeypatch.setattr(
@@ -642,8 +821,8 @@ def test_skip_reason_aggregation_empty_reports_internal_error(db_session, monkey
     monkeypatch.setattr("app.core.alerts._digest_recently_sent", lambda *args, **kwargs: False)
     monkeypatch.setattr("app.core.alerts._claim_digest_fingerprint", lambda *args, **kwargs: True)
     monkeypatch.setattr("app.core.alerts._record_digest_sent", lambda *args, **kwargs: None)
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
     )
     monkeypatch.setattr(
@@ -694,8 +873,8 @@ def test_info_only_watchlist_on_basic_plan(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("NOISY", "LOW", "IGNORE"),
     )
 
@@ -719,8 +898,8 @@ def test_info_only_delivered_on_pro_plan(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("NOISY", "LOW", "IGNORE"),
     )
     payloads = []
@@ -747,8 +926,8 @@ def test_valid_strong_alert_not_non_actionable(db_session, monkeypatch):
     db_session.add(alert)
     db_session.commit()
 
-    monkeypatch.setattr(
-        "app.core.alerts.classify_alert_with_snapshots",
+    _patch_classifier(
+        monkeypatch,
         lambda *_args, **_kwargs: AlertClassification("LIQUIDITY_SWEEP", "MEDIUM", "WAIT"),
     )
     payloads = []
@@ -778,7 +957,7 @@ def test_band_differs_by_classification(db_session, monkeypatch):
             return AlertClassification("REPRICING", "MEDIUM", "FOLLOW")
         return AlertClassification("NOISY", "LOW", "IGNORE")
 
-    monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+    _patch_classifier(monkeypatch, _fake_classify)
 
     payloads = []
     _install_fake_telegram(monkeypatch, payloads)
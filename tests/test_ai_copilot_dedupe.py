@@ -7,7 +7,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.alerts.theme_key import extract_theme
 from app.core import defaults
-from app.core.ai_copilot import create_ai_recommendation
+from app.core.ai_copilot import _claim_copilot_theme, create_ai_recommendation
 from app.db import Base
 from app.models import Alert, User
 
@@ -24,6 +24,26 @@ def db_session():
         session.close()
 
 
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+
+        def _queue(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+
+        return _queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
 class FakeRedis:
     def __init__(self):
         self.store = {}
@@ -87,6 +107,18 @@ class FakeRedis:
         self.expirations.pop(key, None)
         return True
 
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def evalsha(self, sha, numkeys, key, ttl_seconds):
+        # Emulates the copilot theme claim script: SET NX EX, else report TTL.
+        if self.set(key, "1", nx=True, ex=int(ttl_seconds)):
+            return [1, int(ttl_seconds)]
+        ttl = self.ttl(key)
+        if ttl < 0:
+            self.expire(key, int(ttl_seconds))
+        return [0, ttl]
+
 
 def _make_alert(**overrides):
     now_ts = datetime.now(timezone.utc)
@@ -309,3 +341,47 @@ def test_copilot_dedupe_recovers_after_telegram_failure(db_session, monkeypatch)
     fake_redis.advance(defaults.COPILOT_DEDUPE_FAILURE_TTL_SECONDS + 1)
     second = create_ai_recommendation(db_session, user, alert_two)
     assert second is not None
+
+
+class _ScriptedRedis:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def evalsha(self, sha, numkeys, *args):
+        self.calls.append(args)
+        return self.result
+
+
+def test_claim_theme_uses_single_script_call(monkeypatch):
+    scripted = _ScriptedRedis([1, 600])
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", scripted)
+
+    claim = _claim_copilot_theme("user-1", "theme-a", 10)
+
+    assert claim.claimed is True
+    assert claim.ttl_remaining == 600
+    assert scripted.calls == [("copilot:theme:user-1:theme-a", 600)]
+
+
+def test_claim_theme_script_contention_reports_ttl(monkeypatch):
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", _ScriptedRedis([0, 42]))
+    claim = _claim_copilot_theme("user-1", "theme-a", 10)
+    assert claim.claimed is False
+    assert claim.ttl_remaining == 42
+
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", _ScriptedRedis([0, -1]))
+    claim = _claim_copilot_theme("user-1", "theme-a", 10)
+    assert claim.claimed is False
+    assert claim.ttl_remaining is None
+
+
+def test_claim_theme_fails_open_when_script_errors(monkeypatch):
+    class _BrokenRedis:
+        def evalsha(self, *args):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", _BrokenRedis())
+    claim = _claim_copilot_theme("user-1", "theme-a", 10)
+    assert claim.claimed is True
+    assert claim.ttl_remaining is None
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from app.core.ai_copilot import _apply_fast_recommendation_rules
+from app.core.ai_copilot import _apply_fast_recommendation_rules, _parse_evidence_metrics
 from app.core.signal_speed import SIGNAL_SPEED_FAST
 from app.models import Alert
 
@@ -42,3 +42,35 @@ def test_fast_low_confidence_forces_watch_recommendation():
     evidence = ["Observed across 2 snapshots (~10m) within context window"]
     result = _apply_fast_recommendation_rules(llm_result, alert, evidence, SIGNAL_SPEED_FAST)
     assert result["recommendation"] == "WAIT"
+
+
+def test_fast_high_confidence_buy_kept_when_sustained():
+    alert = _make_alert()
+    llm_result = {
+        "recommendation": "BUY",
+        "confidence": "HIGH",
+        "rationale": "Strong move",
+        "risks": "Volatility",
+    }
+    evidence = [
+        "Observed across 3 snapshots (~10m) within context window",
+        "Abs move: +0.070 | pct: +15.0% (15m)",
+    ]
+    result = _apply_fast_recommendation_rules(llm_result, alert, evidence, SIGNAL_SPEED_FAST)
+    assert result["recommendation"] == "BUY"
+
+
+def test_parse_evidence_metrics_single_pass():
+    evidence = [
+        "Observed across 4 snapshots (~20m) within context window",
+        "Abs move: -0.080 | pct: -12.0% (30m)",
+    ]
+    metrics = _parse_evidence_metrics(evidence)
+    assert metrics.sustained_snapshots == 4
+    assert metrics.sustained_minutes == 20
+    assert metrics.abs_move == 0.08
+    assert metrics.window_minutes == 30
+
+    fallback = _parse_evidence_metrics(["Sustained move across 2 snapshots (~5m)"])
+    assert fallback.abs_move is None
+    assert fallback.window_minutes == 5
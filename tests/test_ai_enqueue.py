@@ -163,6 +163,10 @@ def test_ai_enqueue_only_actionable_alerts(db_session, monkeypatch):
         return AlertClassification("LIQUIDITY_SWEEP", "MEDIUM", "WAIT")
 
     monkeypatch.setattr("app.core.alerts.classify_alert_with_snapshots", _fake_classify)
+    monkeypatch.setattr(
+        "app.core.alerts.classify_alerts_with_snapshots",
+        lambda db, alerts: [_fake_classify(db, alert) for alert in alerts],
+    )
 
     enqueued = []
     monkeypatch.setattr("app.core.alerts.queue.enqueue", lambda *args, **kwargs: enqueued.append(args))
@@ -5,16 +5,28 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from app.core.ai_copilot import _build_evidence, _format_ai_message, handle_telegram_callback
+from app.core.ai_copilot import (
+    EvidenceMetrics,
+    _build_evidence,
+    _clear_message_actions,
+    _format_ai_message,
+    _handle_mute,
+    _is_muted,
+    handle_telegram_callback,
+)
 from app.core.signal_speed import SIGNAL_SPEED_FAST
+from app.core.telegram import edit_message_reply_markup
 from app.db import Base
 from app.models import (
+    AiMarketMute,
+    AiThemeMute,
     AiRecommendation,
     AiRecommendationEvent,
     Alert,
     MarketSnapshot,
     User,
 )
+from app.settings import settings
 
 
 @pytest.fixture()
@@ -172,6 +184,34 @@ def test_fast_message_includes_label_and_window():
     assert "WATCH" in text
 
 
+def test_fast_message_uses_precomputed_metrics(monkeypatch):
+    alert = _make_alert()
+    rec = AiRecommendation(
+        user_id=uuid4(),
+        alert_id=1,
+        recommendation="WAIT",
+        confidence="MEDIUM",
+        rationale="Early move; limited follow-through",
+        risks="Volatility fades",
+        status="PROPOSED",
+        created_at=datetime.now(timezone.utc),
+    )
+    evidence = ["Observed across 2 snapshots (~10m) within context window"]
+
+    def _fail_parse(*_args, **_kwargs):
+        raise AssertionError("evidence should not be re-parsed")
+
+    monkeypatch.setattr("app.core.ai_copilot._parse_evidence_metrics", _fail_parse)
+    text, _ = _format_ai_message(
+        alert,
+        rec,
+        evidence,
+        signal_speed=SIGNAL_SPEED_FAST,
+        metrics=EvidenceMetrics(2, 10, 0.04, 10),
+    )
+    assert "Signal window: 10m" in text
+
+
 def test_threshold_claims_removed_when_incorrect():
     alert = _make_alert(market_p_yes=0.365)
     rec = AiRecommendation(
@@ -296,6 +336,10 @@ def test_callback_confirm_updates_status(db_session, monkeypatch):
 
     refreshed = db_session.query(AiRecommendation).filter(AiRecommendation.id == rec.id).one()
     assert refreshed.status == "CONFIRMED"
+    event = db_session.query(AiRecommendationEvent).filter(AiRecommendationEvent.action == "confirmed").one()
+    assert event.recommendation_id == rec.id
+    assert event.user_id == user.user_id
+    assert event.alert_id == alert.id
 
 
 def test_confirm_payload_contains_market_link(db_session, monkeypatch):
@@ -472,3 +516,60 @@ def test_status_transitions_are_idempotent(db_session, monkeypatch):
 
     events = db_session.query(AiRecommendationEvent).filter(AiRecommendationEvent.recommendation_id == rec.id).all()
     assert len(events) == 1
+
+
+def test_is_muted_checks_market_and_theme(db_session):
+    now_ts = datetime.now(timezone.utc)
+    user = User(user_id=uuid4(), name="Trader", telegram_chat_id=123, created_at=now_ts)
+    db_session.add(user)
+    db_session.add(AiMarketMute(user_id=user.user_id, market_id="market-1", expires_at=now_ts + timedelta(hours=1)))
+    db_session.add(AiThemeMute(user_id=user.user_id, theme_key="theme-b", expires_at=now_ts + timedelta(hours=1)))
+    db_session.commit()
+
+    assert _is_muted(db_session, user.user_id, "market-1", "theme-a", now_ts) is True
+    assert _is_muted(db_session, user.user_id, "market-2", "theme-b", now_ts) is True
+    assert _is_muted(db_session, user.user_id, "market-2", "theme-a", now_ts) is False
+
+
+def test_handle_mute_upserts_and_never_shortens(db_session, monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        "app.core.ai_copilot.send_telegram_message",
+        lambda chat_id, text, **kwargs: sent.append(text),
+    )
+    user = User(user_id=uuid4(), name="Trader", telegram_chat_id=123, created_at=datetime.now(timezone.utc))
+    db_session.add(user)
+    db_session.commit()
+
+    first = _handle_mute(db_session, 123, None, "market", "market-1", 60)
+    longer = _handle_mute(db_session, 123, None, "market", "market-1", 1440)
+    shorter = _handle_mute(db_session, 123, None, "market", "market-1", 60)
+
+    assert first["message"] == "Muted this market for 24h."
+    assert longer["message"] == "Muted this market for 24h."
+    assert shorter["message"] == "Already muted."
+    assert len(sent) == 2
+    mutes = db_session.query(AiMarketMute).filter(AiMarketMute.user_id == user.user_id).all()
+    assert len(mutes) == 1
+    expires_at = mutes[0].expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    assert expires_at > datetime.now(timezone.utc) + timedelta(hours=23)
+
+
+def test_clear_message_actions_enqueues_markup_edit(monkeypatch):
+    class _FakeQueue:
+        def __init__(self):
+            self.jobs = []
+
+        def enqueue(self, func, *args):
+            self.jobs.append((func, args))
+
+    fake_queue = _FakeQueue()
+    monkeypatch.setattr("app.core.ai_copilot.queue", fake_queue)
+    monkeypatch.setattr(settings, "TELEGRAM_BOT_TOKEN", "test-token")
+
+    _clear_message_actions(123, 456)
+    _clear_message_actions(123, None)
+
+    assert fake_queue.jobs == [(edit_message_reply_markup, ("123", "456", {"inline_keyboard": []}))]
@@ -1,7 +1,28 @@
 from datetime import datetime, timedelta, timezone
 
-from app.core.alert_classification import classify_alert
-from app.models import Alert
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.alert_classification import (
+    classify_alert,
+    classify_alert_with_snapshots,
+    classify_alerts_with_snapshots,
+)
+from app.db import Base
+from app.models import Alert, MarketSnapshot
+
+
+@pytest.fixture()
+def db_session():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
 
 
 def _make_alert(**overrides):
@@ -92,3 +113,44 @@ def test_classify_alert_noisy_low_liquidity_move():
     assert classification.signal_type == "NOISY"
     assert classification.confidence == "LOW"
     assert classification.suggested_action == "IGNORE"
+
+
+def test_batch_classification_matches_per_alert(db_session):
+    now_ts = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    prices = {
+        "market-1": [0.40, 0.42, 0.44, 0.46, 0.48, 0.50, 0.52],
+        "market-2": [0.60, 0.58, 0.44, 0.58, 0.60, 0.60, 0.60],
+    }
+    for market_id, series in prices.items():
+        for offset, price in enumerate(series):
+            bucket = now_ts + timedelta(minutes=5 * (offset - 3))
+            db_session.add(
+                MarketSnapshot(
+                    market_id=market_id,
+                    title="Sample Market",
+                    category="testing",
+                    market_p_yes=price,
+                    liquidity=6000.0,
+                    volume_24h=7000.0,
+                    volume_1w=0.0,
+                    best_ask=0.0,
+                    last_trade_price=0.0,
+                    model_p_yes=0.5,
+                    edge=0.0,
+                    source_ts=bucket,
+                    snapshot_bucket=bucket,
+                    asof_ts=bucket,
+                )
+            )
+    alerts = [
+        _make_alert(market_id="market-1", liquidity=6000.0, volume_24h=7000.0, snapshot_bucket=now_ts),
+        _make_alert(market_id="market-2", old_price=0.58, new_price=0.44, snapshot_bucket=now_ts),
+        _make_alert(market_id="market-3", snapshot_bucket=now_ts),
+    ]
+    db_session.add_all(alerts)
+    db_session.commit()
+
+    batch = classify_alerts_with_snapshots(db_session, alerts)
+
+    assert batch == [classify_alert_with_snapshots(db_session, alert) for alert in alerts]
+    assert batch[0].signal_type == "REPRICING"
@@ -6,11 +6,11 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core import defaults
-from app.core.ai_copilot import _send_recommendation_message
+from app.core.ai_copilot import _send_recommendation_message, create_ai_recommendation
 from app.core.alert_classification import AlertClassification
 from app.core.alerts import UserDigestConfig, _enqueue_ai_recommendations
 from app.db import Base
-from app.models import AiRecommendation, Alert, Plan, Subscription, User
+from app.models import AiRecommendation, AiRecommendationEvent, Alert, Plan, Subscription, User
 from app.settings import settings
 
 
@@ -38,6 +38,26 @@ def _patch_snapshot_stats(monkeypatch):
     monkeypatch.setattr("app.core.alerts._build_theme_snapshot_stats", _stats)
 
 
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+
+        def _queue(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+
+        return _queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
 class FakeRedis:
     def __init__(self):
         self.store = {}
@@ -78,6 +98,18 @@ class FakeRedis:
         self.expirations.pop(key, None)
         return True
 
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def evalsha(self, sha, numkeys, key, ttl_seconds):
+        # Emulates the copilot theme claim script: SET NX EX, else report TTL.
+        if self.set(key, "1", nx=True, ex=int(ttl_seconds)):
+            return [1, int(ttl_seconds)]
+        ttl = self.ttl(key)
+        if ttl < 0:
+            self.expire(key, int(ttl_seconds))
+        return [0, ttl]
+
 
 def _make_alert(**overrides):
     now_ts = datetime.now(timezone.utc)
@@ -401,3 +433,49 @@ def test_copilot_daily_key_is_date_scoped(db_session, monkeypatch):
 
     key = f"copilot:count:{user.user_id}:2026-01-05"
     assert fake_redis.store[key] == "1"
+    hour_key = f"copilot:hour:{user.user_id}:2026-01-05-12"
+    assert fake_redis.store[hour_key] == "1"
+
+
+def test_create_recommendation_persists_rec_event_and_message_id(db_session, monkeypatch):
+    user = User(
+        user_id=uuid4(),
+        name="Trader",
+        telegram_chat_id=123,
+        copilot_enabled=True,
+        overrides_json={},
+    )
+    alert = _make_alert()
+    db_session.add_all([user, alert])
+    db_session.commit()
+    _seed_active_subscription(db_session, user)
+
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", FakeRedis())
+    monkeypatch.setattr(
+        "app.core.ai_copilot.classify_alert_with_snapshots",
+        lambda *_args, **_kwargs: AlertClassification("REPRICING", "HIGH", "FOLLOW"),
+    )
+    monkeypatch.setattr(
+        "app.core.ai_copilot.get_trade_recommendation",
+        lambda *_args, **_kwargs: {
+            "recommendation": "BUY",
+            "confidence": "HIGH",
+            "rationale": "test",
+            "risks": "test",
+        },
+    )
+    monkeypatch.setattr(
+        "app.core.ai_copilot.send_telegram_message",
+        lambda *args, **kwargs: {"ok": True, "result": {"message_id": 77}},
+    )
+
+    rec = create_ai_recommendation(db_session, user, alert)
+
+    assert rec is not None
+    db_session.expire_all()
+    stored = db_session.query(AiRecommendation).filter(AiRecommendation.id == rec.id).one()
+    assert stored.telegram_message_id == "77"
+    events = db_session.query(AiRecommendationEvent).filter(AiRecommendationEvent.recommendation_id == rec.id).all()
+    assert [event.action for event in events] == ["proposed"]
+    assert events[0].alert_id == alert.id
+    assert events[0].user_id == user.user_id
@@ -1,5 +1,6 @@
 import json
 import time
+from collections import Counter
 from datetime import datetime, timezone
 from uuid import uuid4
 
@@ -9,13 +10,43 @@ from sqlalchemy.orm import sessionmaker
 
 from app.core import defaults
 from app.core.alert_classification import AlertClassification
-from app.core.ai_copilot import COPILOT_LAST_STATUS_KEY, _theme_key_for_alert, create_ai_recommendation
+from app.core.ai_copilot import (
+    COPILOT_LAST_STATUS_KEY,
+    COPILOT_RUN_KEY,
+    COPILOT_RUN_TTL_SECONDS,
+    _COMPLETE_RUN_SCRIPT,
+    _complete_copilot_run,
+    _increment_copilot_run_counter,
+    _theme_key_for_alert,
+    create_ai_recommendation,
+    init_copilot_run,
+)
 from app.alerts.theme_key import extract_theme
 from app.core.alerts import CopilotSkipReason, UserDigestConfig, _enqueue_ai_recommendations
 from app.db import Base
 from app.models import Alert, User
 
 
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+
+        def _queue(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+
+        return _queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
 class FakeRedis:
     def __init__(self):
         self.store = {}
@@ -86,6 +117,30 @@ class FakeRedis:
         bucket[field] = current
         return current
 
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def evalsha(self, sha, numkeys, key, *args):
+        if sha == _COMPLETE_RUN_SCRIPT.sha:
+            # Emulates the run completion script: flush counters, then claim the log once.
+            for field, amount in zip(args[::2], args[1::2]):
+                self.hincrby(key, field, int(amount))
+            completed = self.hincrby(key, "jobs_completed", 1)
+            expected = self.hget(key, "expected_jobs")
+            if expected is None or completed < int(expected):
+                return None
+            if self.hincrby(key, "logged", 1) != 1:
+                return None
+            return [item for pair in self.hgetall(key).items() for item in pair]
+        # Emulates the copilot theme claim script: SET NX EX, else report TTL.
+        ttl_seconds = args[0]
+        if self.set(key, "1", nx=True, ex=int(ttl_seconds)):
+            return [1, int(ttl_seconds)]
+        ttl = self.ttl(key)
+        if ttl < 0:
+            self.expire(key, int(ttl_seconds))
+        return [0, ttl]
+
 
 @pytest.fixture()
 def db_session():
@@ -345,3 +400,64 @@ def test_telegram_failure_skips_daily_count_and_short_ttl(db_session, monkeypatc
     theme_key = _theme_key_for_alert(alert)
     dedupe_key = f"copilot:theme:{user.user_id}:{theme_key}"
     assert fake_redis.ttl(dedupe_key) == defaults.COPILOT_DEDUPE_FAILURE_TTL_SECONDS
+
+
+def test_init_copilot_run_seeds_counters_in_one_pipeline(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", fake_redis)
+
+    init_copilot_run("run-init", {"run_id": "run-init"}, 123.0, expected_jobs=2)
+
+    key = COPILOT_RUN_KEY.format(run_id="run-init")
+    stored = fake_redis.hgetall(key)
+    assert stored["expected_jobs"] == 2
+    assert stored["jobs_completed"] == 0
+    assert stored["started_at"] == 123.0
+    assert stored["logged"] == 0
+    assert fake_redis.ttl(key) == COPILOT_RUN_TTL_SECONDS
+
+
+def test_completed_copilot_run_logs_summary_once(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", fake_redis)
+    logged = []
+    monkeypatch.setattr("app.core.ai_copilot.log_copilot_run_summary", logged.append)
+    monkeypatch.setattr("app.core.ai_copilot.store_copilot_last_status", lambda _summary: None)
+
+    init_copilot_run("run-log", {"run_id": "run-log"}, time.time(), expected_jobs=1)
+    assert logged == []
+
+    fake_redis.hincrby(COPILOT_RUN_KEY.format(run_id="run-log"), "telegram_sends_attempted", 1)
+    _complete_copilot_run("run-log")
+    _complete_copilot_run("run-log")
+
+    assert len(logged) == 1
+    assert logged[0]["run_id"] == "run-log"
+    assert logged[0]["telegram_sends_attempted"] == 1
+    assert logged[0]["skipped_by_reason_counts"] == {"TELEGRAM_ERROR": 1}
+
+
+def test_run_counters_are_buffered_until_completion(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr("app.core.ai_copilot.redis_conn", fake_redis)
+    logged = []
+    monkeypatch.setattr("app.core.ai_copilot.log_copilot_run_summary", logged.append)
+    monkeypatch.setattr("app.core.ai_copilot.store_copilot_last_status", lambda _summary: None)
+
+    init_copilot_run("run-buffer", {"run_id": "run-buffer"}, time.time(), expected_jobs=1)
+    key = COPILOT_RUN_KEY.format(run_id="run-buffer")
+    run_counters = Counter()
+    _increment_copilot_run_counter("run-buffer", "llm_calls_attempted", 1, run_counters)
+    _increment_copilot_run_counter("run-buffer", "llm_calls_succeeded", 1, run_counters)
+    _increment_copilot_run_counter("run-buffer", "telegram_sends_attempted", 1, run_counters)
+
+    assert fake_redis.hgetall(key)["llm_calls_attempted"] == 0
+
+    _complete_copilot_run("run-buffer", run_counters)
+
+    stored = fake_redis.hgetall(key)
+    assert stored["llm_calls_attempted"] == 1
+    assert stored["jobs_completed"] == 1
+    assert len(logged) == 1
+    assert logged[0]["llm_calls_succeeded"] == 1
+    assert logged[0]["telegram_sends_attempted"] == 1
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from uuid import uuid4
 
 from app.core import alerts
+from app.models import Alert
 
 
 def test_digest_recently_sent_respects_window(monkeypatch):
@@ -23,3 +25,104 @@ def test_digest_recently_sent_respects_window(monkeypatch):
 
     assert alerts._digest_recently_sent(user_id, now, window_minutes=10) is True
     assert alerts._digest_recently_sent(user_id, now, window_minutes=1) is False
+
+
+def test_digest_recently_sent_prefers_prefetched_values(monkeypatch):
+    now = datetime.now(timezone.utc)
+    user_id = uuid4()
+    other_user_id = uuid4()
+    gets = []
+
+    class FakeRedis:
+        def get(self, key):
+            gets.append(key)
+            return None
+
+    monkeypatch.setattr(alerts, "redis_conn", FakeRedis())
+    key = alerts.USER_DIGEST_LAST_SENT_KEY.format(user_id=user_id)
+    last_sent = {key: (now - timedelta(minutes=5)).isoformat().encode("utf-8")}
+
+    assert alerts._digest_recently_sent(user_id, now, window_minutes=10, last_sent=last_sent) is True
+    assert gets == []
+    assert alerts._digest_recently_sent(other_user_id, now, window_minutes=10, last_sent=last_sent) is False
+    assert gets == [alerts.USER_DIGEST_LAST_SENT_KEY.format(user_id=other_user_id)]
+
+
+def test_load_digest_last_sent_uses_one_mget(monkeypatch):
+    configs = [SimpleNamespace(user_id=uuid4(), fast_signals_enabled=enabled) for enabled in (True, False)]
+    calls = []
+
+    class FakeRedis:
+        def mget(self, keys):
+            calls.append(list(keys))
+            return [b"stamp"] + [None] * (len(keys) - 1)
+
+    monkeypatch.setattr(alerts, "redis_conn", FakeRedis())
+    monkeypatch.setattr(alerts.settings, "FAST_SIGNALS_GLOBAL_ENABLED", True)
+
+    last_sent = alerts._load_digest_last_sent(configs)
+
+    expected_keys = [
+        alerts.USER_DIGEST_LAST_SENT_KEY.format(user_id=configs[0].user_id),
+        alerts.USER_DIGEST_LAST_SENT_KEY.format(user_id=configs[1].user_id),
+        alerts.USER_FAST_DIGEST_LAST_SENT_KEY.format(user_id=configs[0].user_id),
+    ]
+    assert calls == [expected_keys]
+    assert last_sent == {expected_keys[0]: b"stamp", expected_keys[1]: None, expected_keys[2]: None}
+
+def test_digest_fingerprint_ignores_alert_order_and_tracks_window():
+    now = datetime.now(timezone.utc)
+    first = Alert(
+        market_id="market-1",
+        title="Will the Fed cut rates in March?",
+        liquidity=1000.0,
+        volume_24h=1000.0,
+        snapshot_bucket=now,
+    )
+    second = Alert(
+        market_id="market-2",
+        title="Will it snow in Paris tomorrow?",
+        liquidity=2000.0,
+        volume_24h=2000.0,
+        snapshot_bucket=now,
+    )
+
+    fingerprint = alerts._digest_fingerprint_hash(60, [first, second])
+
+    assert len(fingerprint) == 16
+    assert alerts._digest_fingerprint_hash(60, [second, first]) == fingerprint
+    assert alerts._digest_fingerprint_hash(30, [first, second]) != fingerprint
+    assert alerts._digest_fingerprint_hash(60, [first]) != fingerprint
+    assert alerts._digest_fingerprint_hash(60, []) == ""
+
+
+def test_record_digest_sent_writes_state_in_one_pipeline(monkeypatch):
+    now = datetime.now(timezone.utc)
+    user_id = uuid4()
+    executed = []
+
+    class FakePipeline:
+        def __init__(self):
+            self.commands = []
+
+        def set(self, key, value):
+            self.commands.append((key, value))
+
+        def execute(self):
+            executed.append(self.commands)
+
+    class FakeRedis:
+        def pipeline(self, transaction=True):
+            assert transaction is False
+            return FakePipeline()
+
+    monkeypatch.setattr(alerts, "redis_conn", FakeRedis())
+
+    alerts._record_digest_sent(user_id, "tenant-1", now, 15, [], [])
+
+    assert len(executed) == 1
+    written = dict(executed[0])
+    assert written[alerts.USER_DIGEST_LAST_SENT_KEY.format(user_id=user_id)] == now.isoformat()
+    payload = written[alerts.USER_DIGEST_LAST_PAYLOAD_KEY.format(user_id=user_id)]
+    assert written[alerts.TENANT_DIGEST_LAST_PAYLOAD_KEY.format(tenant_id="tenant-1")] == payload
+    assert '"window_minutes": 15' in payload
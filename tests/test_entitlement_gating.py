@@ -3,10 +3,11 @@ from datetime import datetime, timezone, timedelta
 from uuid import uuid4
 
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
-from app.core.alerts import send_user_digests
+from app.core import alerts as alerts_module
+from app.core.alerts import _record_alert_deliveries, send_user_digests
 from app.core.ai_copilot import _send_recommendation_message
 from app.db import Base
 from app.models import Alert, AlertDelivery, AiRecommendation, Plan, Subscription, User
@@ -83,7 +84,18 @@ def test_scheduler_skips_unsubscribed_user(db_session, monkeypatch):
     try:
         calls = {"count": 0}
 
-        async def _fake_send_user_digest(db, tenant_id, config, fast_section=None):
+        async def _fake_send_user_digest(
+            db,
+            tenant_id,
+            config,
+            fast_section=None,
+            http_client=None,
+            preloaded_alerts=None,
+            delivery_rows=None,
+            last_sent=None,
+            classification_cache=None,
+            filter_values=None,
+        ):
             calls["count"] += 1
             db.add(
                 AlertDelivery(
@@ -122,7 +134,18 @@ def test_scheduler_allows_subscribed_user(db_session, monkeypatch):
     try:
         calls = {"count": 0}
 
-        async def _fake_send_user_digest(db, tenant_id, config, fast_section=None):
+        async def _fake_send_user_digest(
+            db,
+            tenant_id,
+            config,
+            fast_section=None,
+            http_client=None,
+            preloaded_alerts=None,
+            delivery_rows=None,
+            last_sent=None,
+            classification_cache=None,
+            filter_values=None,
+        ):
             calls["count"] += 1
             db.add(
                 AlertDelivery(
@@ -144,6 +167,280 @@ def test_scheduler_allows_subscribed_user(db_session, monkeypatch):
     assert db_session.query(AlertDelivery).count() == 1
 
 
+def test_scheduler_shares_http_client_across_users(db_session, monkeypatch):
+    users = [
+        User(user_id=uuid4(), name="Trader A", telegram_chat_id=123, overrides_json={}),
+        User(user_id=uuid4(), name="Trader B", telegram_chat_id=456, overrides_json={}),
+    ]
+    db_session.add_all(users)
+    db_session.commit()
+    _seed_active_subscription(db_session, users[0])
+    users[1].plan_id = users[0].plan_id
+    db_session.add(
+        Subscription(
+            user_id=users[1].user_id,
+            plan_id=users[0].plan_id,
+            status="active",
+            current_period_end=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    db_session.commit()
+
+    created = []
+
+    class _FakeClient:
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    seen_clients = []
+
+    async def _fake_send_user_digest(
+        db,
+        tenant_id,
+        config,
+        fast_section=None,
+        http_client=None,
+        preloaded_alerts=None,
+        delivery_rows=None,
+        last_sent=None,
+        classification_cache=None,
+        filter_values=None,
+    ):
+        seen_clients.append(http_client)
+        return {"sent": True}
+
+    original_token = settings.TELEGRAM_BOT_TOKEN
+    settings.TELEGRAM_BOT_TOKEN = "test-token"
+    try:
+        monkeypatch.setattr("app.core.alerts.httpx.AsyncClient", _FakeClient)
+        monkeypatch.setattr("app.core.alerts._send_user_digest", _fake_send_user_digest)
+        monkeypatch.setattr("app.core.alerts._prepare_fast_digest", lambda *args, **kwargs: (None, None))
+        result = asyncio.run(send_user_digests(db_session, "tenant-1"))
+    finally:
+        settings.TELEGRAM_BOT_TOKEN = original_token
+
+    assert result["sent"] == 2
+    assert len(created) == 1
+    assert seen_clients == [created[0], created[0]]
+
+
+def test_scheduler_loads_alerts_once_for_all_users(db_session, monkeypatch):
+    users = [
+        User(user_id=uuid4(), name="Trader A", telegram_chat_id=123, overrides_json={}),
+        User(user_id=uuid4(), name="Trader B", telegram_chat_id=456, overrides_json={}),
+    ]
+    alert = _make_alert()
+    db_session.add_all([*users, alert])
+    db_session.commit()
+    _seed_active_subscription(db_session, users[0])
+    db_session.add(
+        Subscription(
+            user_id=users[1].user_id,
+            plan_id=users[0].plan_id,
+            status="active",
+            current_period_end=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    db_session.commit()
+    alert_id = alert.id
+
+    seen_alerts = []
+
+    async def _fake_send_user_digest(
+        db,
+        tenant_id,
+        config,
+        fast_section=None,
+        http_client=None,
+        preloaded_alerts=None,
+        delivery_rows=None,
+        last_sent=None,
+        classification_cache=None,
+        filter_values=None,
+    ):
+        seen_alerts.append(preloaded_alerts)
+        db.commit()
+        return {"sent": True}
+
+    original_token = settings.TELEGRAM_BOT_TOKEN
+    settings.TELEGRAM_BOT_TOKEN = "test-token"
+    try:
+        monkeypatch.setattr("app.core.alerts._send_user_digest", _fake_send_user_digest)
+        monkeypatch.setattr("app.core.alerts._prepare_fast_digest", lambda *args, **kwargs: (None, None))
+        asyncio.run(send_user_digests(db_session, "tenant-1"))
+    finally:
+        settings.TELEGRAM_BOT_TOKEN = original_token
+
+    assert len(seen_alerts) == 2
+    assert seen_alerts[0] is seen_alerts[1]
+    assert [row.id for row in seen_alerts[1]] == [alert_id]
+
+
+def test_scheduler_flushes_deliveries_in_user_chunks(db_session, monkeypatch):
+    users = [
+        User(user_id=uuid4(), name="Trader A", telegram_chat_id=123, overrides_json={}),
+        User(user_id=uuid4(), name="Trader B", telegram_chat_id=456, overrides_json={}),
+    ]
+    alert = _make_alert()
+    db_session.add_all([*users, alert])
+    db_session.commit()
+    _seed_active_subscription(db_session, users[0])
+    db_session.add(
+        Subscription(
+            user_id=users[1].user_id,
+            plan_id=users[0].plan_id,
+            status="active",
+            current_period_end=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    db_session.commit()
+    alert_id = alert.id
+
+    rows_seen_during_run = []
+
+    async def _fake_send_user_digest(
+        db,
+        tenant_id,
+        config,
+        fast_section=None,
+        http_client=None,
+        preloaded_alerts=None,
+        delivery_rows=None,
+        last_sent=None,
+        classification_cache=None,
+        filter_values=None,
+    ):
+        _record_alert_deliveries(
+            db,
+            [],
+            preloaded_alerts,
+            config.user_id,
+            datetime.now(timezone.utc),
+            sent_alert_ids={alert_id},
+            delivery_rows=delivery_rows,
+        )
+        rows_seen_during_run.append(db.query(AlertDelivery).count())
+        return {"sent": True}
+
+    upserts = []
+    original_upsert = alerts_module._upsert_alert_deliveries
+
+    def _spy_upsert(db, rows):
+        upserts.append(len(rows))
+        original_upsert(db, rows)
+
+    original_token = settings.TELEGRAM_BOT_TOKEN
+    settings.TELEGRAM_BOT_TOKEN = "test-token"
+    try:
+        monkeypatch.setattr("app.core.alerts._send_user_digest", _fake_send_user_digest)
+        monkeypatch.setattr("app.core.alerts._prepare_fast_digest", lambda *args, **kwargs: (None, None))
+        monkeypatch.setattr("app.core.alerts._upsert_alert_deliveries", _spy_upsert)
+        monkeypatch.setattr(alerts_module, "ALERT_DELIVERY_FLUSH_USERS", 1)
+        asyncio.run(send_user_digests(db_session, "tenant-1"))
+    finally:
+        settings.TELEGRAM_BOT_TOKEN = original_token
+
+    assert rows_seen_during_run == [0, 1]
+    assert upserts == [1, 1, 0]
+    deliveries = db_session.query(AlertDelivery).all()
+    assert {row.user_id for row in deliveries} == {user.user_id for user in users}
+    assert {row.delivery_status for row in deliveries} == {"sent"}
+
+
+def test_scheduler_does_not_write_pending_deliveries_on_error(db_session, monkeypatch):
+    user = User(user_id=uuid4(), name="Trader A", telegram_chat_id=123, overrides_json={})
+    alert = _make_alert()
+    db_session.add_all([user, alert])
+    db_session.commit()
+    _seed_active_subscription(db_session, user)
+    alert_id = alert.id
+
+    async def _failing_send_user_digest(
+        db,
+        tenant_id,
+        config,
+        fast_section=None,
+        http_client=None,
+        preloaded_alerts=None,
+        delivery_rows=None,
+        last_sent=None,
+        classification_cache=None,
+        filter_values=None,
+    ):
+        _record_alert_deliveries(
+            db,
+            [],
+            preloaded_alerts,
+            config.user_id,
+            datetime.now(timezone.utc),
+            sent_alert_ids={alert_id},
+            delivery_rows=delivery_rows,
+        )
+        raise RuntimeError("send exploded")
+
+    upserts = []
+    original_token = settings.TELEGRAM_BOT_TOKEN
+    settings.TELEGRAM_BOT_TOKEN = "test-token"
+    try:
+        monkeypatch.setattr("app.core.alerts._send_user_digest", _failing_send_user_digest)
+        monkeypatch.setattr("app.core.alerts._prepare_fast_digest", lambda *args, **kwargs: (None, None))
+        monkeypatch.setattr("app.core.alerts._upsert_alert_deliveries", lambda db, rows: upserts.append(rows))
+        with pytest.raises(RuntimeError, match="send exploded"):
+            asyncio.run(send_user_digests(db_session, "tenant-1"))
+    finally:
+        settings.TELEGRAM_BOT_TOKEN = original_token
+
+    assert upserts == []
+
+
+def test_scheduler_loads_preferences_in_one_query(db_session, monkeypatch):
+    users = [
+        User(user_id=uuid4(), name="Trader A", telegram_chat_id=123, overrides_json={}),
+        User(user_id=uuid4(), name="Trader B", telegram_chat_id=456, overrides_json={}),
+    ]
+    db_session.add_all(users)
+    db_session.commit()
+    _seed_active_subscription(db_session, users[0])
+    db_session.add(
+        Subscription(
+            user_id=users[1].user_id,
+            plan_id=users[0].plan_id,
+            status="active",
+            current_period_end=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    db_session.commit()
+
+    statements = []
+
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def _fake_send_user_digest(db, tenant_id, config, **kwargs):
+        return {"sent": True}
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", _record_statement)
+    original_token = settings.TELEGRAM_BOT_TOKEN
+    settings.TELEGRAM_BOT_TOKEN = "test-token"
+    try:
+        monkeypatch.setattr("app.core.alerts._send_user_digest", _fake_send_user_digest)
+        monkeypatch.setattr("app.core.alerts._prepare_fast_digest", lambda *args, **kwargs: (None, None))
+        result = asyncio.run(send_user_digests(db_session, "tenant-1"))
+    finally:
+        settings.TELEGRAM_BOT_TOKEN = original_token
+        event.remove(engine, "before_cursor_execute", _record_statement)
+
+    assert result["sent"] == 2
+    assert sum("FROM user_alert_preferences" in statement for statement in statements) == 1
+
+
 def test_telegram_send_skips_unsubscribed_user(db_session, monkeypatch):
     user = User(
         user_id=uuid4(),
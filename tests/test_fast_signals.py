@@ -5,7 +5,12 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from app.core.alerts import UserDigestConfig, _format_fast_digest_message, _prepare_fast_digest
+from app.core.alerts import (
+    UserDigestConfig,
+    _fast_alert_query,
+    _format_fast_digest_message,
+    _prepare_fast_digest,
+)
 from app.core.fast_signals import compute_fast_signals
 from app.models import Alert, MarketSnapshot
 from app.core import defaults
@@ -289,6 +294,43 @@ def test_fast_throttle_blocks_digest(db_session, monkeypatch):
     assert reason == "recent_fast_digest"
 
 
+def test_fast_alert_query_prunes_below_fixed_thresholds(db_session):
+    now_ts = datetime.now(timezone.utc)
+    for market_id, liquidity, volume_24h in (
+        ("liquid", 30000.0, 30000.0),
+        ("thin-book", defaults.FAST_MIN_LIQUIDITY - 1, 30000.0),
+        ("low-volume", 30000.0, defaults.FAST_MIN_VOLUME_24H - 1),
+    ):
+        db_session.add(
+            Alert(
+                tenant_id="tenant-1",
+                alert_type="FAST_DISLOCATION",
+                market_id=market_id,
+                title=market_id,
+                category="testing",
+                move=0.1,
+                market_p_yes=0.5,
+                prev_market_p_yes=0.45,
+                old_price=0.45,
+                new_price=0.5,
+                delta_pct=0.1,
+                liquidity=liquidity,
+                volume_24h=volume_24h,
+                strength="LOW",
+                snapshot_bucket=now_ts,
+                source_ts=now_ts,
+                message="fast",
+                triggered_at=now_ts,
+                created_at=now_ts,
+            )
+        )
+    db_session.commit()
+
+    rows = _fast_alert_query(db_session, "tenant-1", now_ts - timedelta(minutes=15)).all()
+
+    assert [row.market_id for row in rows] == ["liquid"]
+
+
 def test_fast_theme_caps_apply():
     now_ts = datetime.now(timezone.utc)
     alerts = [
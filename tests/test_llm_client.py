@@ -1,6 +1,7 @@
 import json
 
-from app.llm.client import _parse_openai_response
+from app.llm.client import _parse_openai_response, get_trade_recommendation
+from app.settings import settings
 
 
 def test_llm_response_parsing_invalid_json_returns_wait():
@@ -27,3 +28,100 @@ def test_llm_response_parsing_valid_json():
     result = _parse_openai_response(payload)
     assert result["recommendation"] == "BUY"
     assert result["confidence"] == "HIGH"
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+        return True
+
+
+class _FakeResponse:
+    is_success = True
+    status_code = 200
+    text = ""
+
+    def json(self):
+        content = json.dumps(
+            {"recommendation": "BUY", "confidence": "HIGH", "rationale": "Move.", "risks": "Fade."}
+        )
+        return {"choices": [{"message": {"content": content}}]}
+
+
+def test_llm_recommendation_is_shared_across_users_for_same_alert(monkeypatch):
+    calls = []
+
+    class _FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, tb):
+            return False
+
+        def post(self, *args, **kwargs):
+            calls.append(kwargs["json"])
+            return _FakeResponse()
+
+    monkeypatch.setattr("app.llm.client.redis_conn", FakeRedis())
+    monkeypatch.setattr("app.llm.client.httpx.Client", _FakeClient)
+    monkeypatch.setattr("app.llm.client.log_httpx_response", lambda *args, **kwargs: None)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+
+    context = {"alert_id": 7, "signal_speed": "STANDARD", "window_minutes": 60}
+    first = get_trade_recommendation({**context, "user_id": "user-a"})
+    second = get_trade_recommendation({**context, "user_id": "user-b"})
+    fast = get_trade_recommendation({**context, "user_id": "user-b", "signal_speed": "FAST"})
+
+    assert first == second == fast
+    assert first["recommendation"] == "BUY"
+    assert len(calls) == 2
+
+
+def test_llm_fallbacks_are_not_cached(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr("app.llm.client.redis_conn", fake_redis)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "")
+
+    result = get_trade_recommendation({"alert_id": 7, "signal_speed": "STANDARD", "window_minutes": 60})
+
+    assert result["recommendation"] == "WAIT"
+    assert fake_redis.store == {}
+
+
+def test_llm_cache_key_changes_with_evidence(monkeypatch):
+    calls = []
+
+    class _FakeClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, tb):
+            return False
+
+        def post(self, *args, **kwargs):
+            calls.append(kwargs["json"])
+            return _FakeResponse()
+
+    monkeypatch.setattr("app.llm.client.redis_conn", FakeRedis())
+    monkeypatch.setattr("app.llm.client.httpx.Client", _FakeClient)
+    monkeypatch.setattr("app.llm.client.log_httpx_response", lambda *args, **kwargs: None)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+
+    context = {"alert_id": 7, "signal_speed": "STANDARD", "window_minutes": 60}
+    get_trade_recommendation({**context, "evidence": ["Sustained move across 2 snapshots (~10m)"]})
+    get_trade_recommendation({**context, "evidence": ["Sustained move across 2 snapshots (~10m)"]})
+    get_trade_recommendation({**context, "evidence": ["Sustained move across 3 snapshots (~15m)"]})
+
+    assert len(calls) == 2
@@ -58,6 +58,28 @@ def test_start_no_payload_creates_pending(db_session, monkeypatch):
     assert sent["text"] == START_MESSAGE_PENDING
 
 
+def test_start_repeat_updates_existing_pending(db_session, monkeypatch):
+    _install_fake_sender(monkeypatch)
+    first_seen = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db_session.add(
+        PendingTelegramChat(
+            telegram_chat_id=123,
+            first_seen_at=first_seen,
+            last_seen_at=first_seen,
+            status="pending",
+        )
+    )
+    db_session.commit()
+
+    result = handle_telegram_update(db_session, _payload("/start"))
+
+    db_session.expire_all()
+    pending = db_session.query(PendingTelegramChat).one()
+    assert pending.first_seen_at.replace(tzinfo=timezone.utc) == first_seen
+    assert pending.last_seen_at.replace(tzinfo=timezone.utc) > first_seen
+    assert result["reason"] == "pending"
+
+
 def test_start_invalid_payload_creates_pending(db_session, monkeypatch):
     sent = _install_fake_sender(monkeypatch)
 
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 
 from app.core.alert_classification import AlertClassification
+from app.core import defaults
 from app.core.alerts import _format_digest_message, group_alerts_into_themes
 from app.models import Alert
 
@@ -176,3 +177,42 @@ def test_theme_caps_apply_per_user():
     assert "PMD - 1 theme (60m)" in text
     assert "#1 THEME" in text
     assert "#2 THEME" not in text
+
+
+def test_similar_titles_with_different_keys_join_first_matching_theme():
+    alerts = [
+        _make_alert(market_id="fed-march", title="Will the Fed cut rates at the March meeting?"),
+        _make_alert(market_id="oil-100", title="Will oil close above $100 this year?"),
+        _make_alert(market_id="fed-march-again", title="Will the Fed cut rates at the March meeting again?"),
+    ]
+
+    themes = group_alerts_into_themes(alerts)
+
+    assert len(themes) == 2
+    assert [alert.market_id for alert in themes[0].alerts] == ["fed-march", "fed-march-again"]
+    assert [alert.market_id for alert in themes[1].alerts] == ["oil-100"]
+
+
+def test_ungrouped_formatting_classifies_each_alert_once(monkeypatch):
+    monkeypatch.setattr(defaults, "THEME_GROUPING_ENABLED", False)
+    calls = []
+
+    def _counting_classify(alert):
+        calls.append(alert.market_id)
+        return AlertClassification("REPRICING", "HIGH", "FOLLOW")
+
+    alerts = [
+        _make_alert(market_id="btc-above-90k", title="Will the price of Bitcoin be above $90,000 on January 3?"),
+        _make_alert(market_id="hawks-knicks", title="Hawks vs Knicks on January 3?"),
+    ]
+
+    text = _format_digest_message(
+        alerts=alerts,
+        window_minutes=60,
+        total_actionable=2,
+        user_name="Alice",
+        classifier=_counting_classify,
+    )
+
+    assert "PMD - 2 actionable repricings (60m)" in text
+    assert sorted(calls) == ["btc-above-90k", "hawks-knicks"]